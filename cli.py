@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Headless batch generation of game PDFs, for cron jobs, CI and servers
+without a display. Only the GUI-free engine is imported.
+
+    python cli.py all
+    python cli.py 1 3 7 --jobs 4
+    python cli.py --difficulty Easy --engine vector --layout multi-ring
+    python cli.py 4 --layout random --seed 7
+    python cli.py all --dpi 300 --compositor numpy
+    python cli.py 2 --export png
+    python cli.py all --paper a3 --card-diameter 150 --bleed 9
+    python cli.py all --stats-log logs/builds.jsonl --profile profiles
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine import (get_games, build_game_pdf, export_game_cards, initialize_database,
+                    JsonLogSink, ProfileSink, LAYOUT_STYLES, COMPOSITORS, EXPORT_FORMATS,
+                    PAPER_SIZES, PACKINGS, CARD_DIAMETER, CARD_BLEED, DECK_ORDER)
+
+
+def build_job(game, sinks=(), export=None, engine='raster', paper='a4', bleed=CARD_BLEED,
+              packing=None, **options):
+    """Build one game's PDF, or export its cards, and time it, runs in a worker process"""
+    start = time.perf_counter()
+    summary = None
+    try:
+        if export:
+            deck_report = export_game_cards(game, export, sinks=sinks, **options)
+        else:
+            deck_report = build_game_pdf(game, engine=engine, sinks=sinks, paper=paper,
+                                         bleed=bleed, packing=packing, **options)
+        summary = deck_report.summary()
+        error = None
+    except Exception as e:
+        error = str(e)
+    return game, time.perf_counter() - start, error, export, summary
+
+
+def report(game, seconds, error, export=None, summary=None):
+    """Print one game's result, returns 1 for a failed build"""
+    if error:
+        print(f"FAILED {game.id}: {game.name} after {seconds:.2f}s: {error}")
+        return 1
+    output = game.cards_file() if export else game.pdf_file()
+    print(f"OK     {game.id}: {game.name} in {seconds:.2f}s -> {output}")
+    if summary:
+        print(f"       deck: {summary}")
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate game PDFs without the GUI")
+    parser.add_argument('games', nargs='*',
+                        help="game ids to build, or 'all' for every game")
+    parser.add_argument('--difficulty', choices=['Easy', 'Medium', 'Hard'],
+                        help="only build games of this difficulty")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="processes to use, games are built in parallel and the jobs "
+                             "left over render the pages of each game")
+    parser.add_argument('--engine', choices=['raster', 'vector'], default='raster')
+    parser.add_argument('--dpi', type=int, help="render cards at this resolution")
+    parser.add_argument('--paper', choices=PAPER_SIZES, default='a4')
+    parser.add_argument('--card-diameter', type=int, default=CARD_DIAMETER, metavar='POINTS',
+                        help="size of a card's cut line, 72 points to the inch")
+    parser.add_argument('--bleed', type=float, default=CARD_BLEED, metavar='POINTS',
+                        help="room kept clear around every card")
+    parser.add_argument('--packing', choices=PACKINGS,
+                        help="arrangement of the cards on a sheet, by default whichever "
+                             "fits more of them")
+    parser.add_argument('--export', choices=EXPORT_FORMATS,
+                        help="write a ZIP with one image per card instead of the PDF, "
+                             "at 300 dpi unless --dpi is given")
+    parser.add_argument('--max-order', type=int, default=DECK_ORDER, metavar='ORDER',
+                        help="largest deck to build, cards get ORDER + 1 symbols; the "
+                             "default 7 is the standard deck of 57 cards")
+    parser.add_argument('--layout', choices=LAYOUT_STYLES, default='ring',
+                        help="how the symbols are arranged on each card")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the random layout, the same seed gives the same cards")
+    parser.add_argument('--compositor', choices=COMPOSITORS, default='pillow',
+                        help="how cards are blended onto pages, numpy is faster with --dpi "
+                             "and needs NumPy installed")
+    parser.add_argument('--stats-log', metavar='PATH',
+                        help="append each build's per-stage timings to this JSON lines file")
+    parser.add_argument('--profile', metavar='DIR',
+                        help="write a cProfile dump of each build to this directory")
+    args = parser.parse_args(argv)
+
+    if not args.games and not args.difficulty:
+        parser.error("give game ids, 'all' or --difficulty")
+    if 'all' in args.games:
+        if len(args.games) > 1:
+            parser.error("'all' can't be combined with game ids")
+        args.games = []
+    elif not all(game_id.isdigit() for game_id in args.games):
+        parser.error("game ids must be numbers")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.max_order < 2:
+        parser.error("--max-order must be at least 2")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    initialize_database()
+
+    game_ids = [int(game_id) for game_id in args.games]
+    games = get_games(game_ids, args.difficulty)
+    missing = set(game_ids) - {game.id for game in games}
+    for game_id in sorted(missing):
+        print(f"Game {game_id} not found", file=sys.stderr)
+    if not games:
+        print("No games to build", file=sys.stderr)
+        return 1
+
+    sinks = []
+    if args.stats_log:
+        sinks.append(JsonLogSink(args.stats_log))
+    if args.profile:
+        sinks.append(ProfileSink(args.profile))
+
+    # Fewer games than jobs, each game renders its pages with the jobs left over
+    parallel_games = min(args.jobs, len(games))
+    options = {'workers': args.jobs // parallel_games, 'engine': args.engine, 'dpi': args.dpi, 'layout': args.layout, 'seed': args.seed,
+               'compositor': args.compositor, 'export': args.export, 'paper': args.paper,
+               'card_diameter': args.card_diameter, 'bleed': args.bleed, 'packing': args.packing,
+               'max_order': args.max_order}
+    start = time.perf_counter()
+    failures = 0
+    if parallel_games == 1:
+        for game in games:
+            failures += report(*build_job(game, sinks, **options))
+    else:
+        # Bounded job pool, each game renders inside its own worker
+        with ProcessPoolExecutor(max_workers=parallel_games) as executor:
+            futures = [executor.submit(build_job, game, sinks, **options) for game in games]
+            for future in as_completed(futures):
+                failures += report(*future.result())
+
+    print(f"Built {len(games) - failures} of {len(games)} games "
+          f"in {time.perf_counter() - start:.2f}s")
+    return 1 if failures or missing else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
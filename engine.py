@@ -0,0 +1,2237 @@
+"""
+GUI-free core of the card game generator: games, image caches, the deck
+engine and PDF rendering. Importing it never loads tkinter, so it can be
+used from the command line, cron jobs and worker processes.
+"""
+
+import io
+import os
+import json
+import math
+import mmap
+import time
+import random
+import zlib
+import zipfile
+import cProfile
+import contextlib
+import hashlib
+import sqlite3
+import functools
+import itertools
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from PIL import Image, ImageDraw, ImageOps
+
+# Optional, only the 'numpy' compositor needs it. Imported on first use, it would
+# otherwise double the start-up of every CLI run and render worker
+numpy = None
+
+
+# Files accepted as game images, compared case-insensitively
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class Game:
+    def __init__(self, id, name, difficulty):
+        self.id = id
+        self.name = name
+        self.difficulty = difficulty
+
+    def pdf_file(self):
+        base_path = 'documents'
+        # folder should exist
+        os.makedirs(base_path, exist_ok=True)
+        filename = f"{self.name.replace(' ', '-').lower()}.pdf"
+        path = os.path.join(base_path, filename)
+        return path
+
+    def cards_file(self):
+        """ZIP archive of the cards as separate images, see export_cards"""
+        os.makedirs('documents', exist_ok=True)
+        return os.path.join('documents', f"{self.name.replace(' ', '-').lower()}-cards.zip")
+
+    def pdf_file_exists(self):
+        return os.path.isfile(self.pdf_file())
+
+    def image_folder(self):
+        return os.path.join('images', str(self.id))
+
+
+def resize_image(filename, new_width):
+    try:
+        print(f"Opening image: {filename}")
+        original_image = Image.open(filename)
+        
+        # Convert to RGB if necessary (for PNG with transparency)
+        if original_image.mode in ('RGBA', 'LA', 'P'):
+            # Create a white background
+            background = Image.new('RGB', original_image.size, (255, 255, 255))
+            if original_image.mode == 'P':
+                original_image = original_image.convert('RGBA')
+            background.paste(original_image, mask=original_image.split()[-1] if original_image.mode == 'RGBA' else None)
+            original_image = background
+        elif original_image.mode != 'RGB':
+            original_image = original_image.convert('RGB')
+        
+        original_width, original_height = original_image.size
+        
+        # Calculate new dimensions maintaining aspect ratio
+        if original_width > original_height:
+            # Landscape image - fit to width
+            new_height = int((new_width / original_width) * original_height)
+        else:
+            # Portrait or square image - fit to height
+            new_height = new_width
+            new_width = int((new_height / original_height) * original_width)
+        
+        resized_image = original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        print(f"Resized image from {original_width}x{original_height} to {new_width}x{new_height}")
+        return resized_image
+    except Exception as e:
+        print(f"Error in resize_image: {str(e)}")
+        # Return a placeholder image if loading fails
+        placeholder = Image.new('RGB', (new_width, new_width), color='lightgray')
+        return placeholder
+
+
+class BuildStats:
+    """Per-stage durations, counts and bytes of one PDF build
+
+    Used as a context manager around a build. While it is active every
+    stage() in this process is recorded, and iter_rendered brings back the
+    stages recorded in worker processes. Stage times are summed over all
+    workers, so in parallel builds they can add up to more than the wall time.
+    """
+
+    def __init__(self, label=None, sinks=()):
+        self.label = label
+        self.sinks = list(sinks)
+        self.stages = {}
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def add(self, name, seconds, count=1, nbytes=0):
+        with self._lock:
+            totals = self.stages.setdefault(name, [0.0, 0, 0])
+            totals[0] += seconds
+            totals[1] += count
+            totals[2] += nbytes
+
+    def merge(self, stages):
+        for name, (seconds, count, nbytes) in stages.items():
+            self.add(name, seconds, count, nbytes)
+
+    def summary(self):
+        return {
+            'label': self.label,
+            'seconds': self.seconds,
+            'stages': {name: {'seconds': round(seconds, 6), 'count': count, 'bytes': nbytes}
+                       for name, (seconds, count, nbytes) in self.stages.items()},
+        }
+
+    def __enter__(self):
+        global _active_stats
+        self._previous = _active_stats
+        _active_stats = self
+        for sink in self.sinks:
+            sink.start(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_stats
+        self.seconds = round(time.perf_counter() - self._start, 6)
+        _active_stats = self._previous
+        summary = self.summary()
+        summary['error'] = None if exc_value is None else str(exc_value)
+        for sink in self.sinks:
+            sink.finish(self, summary)
+
+
+# Stats of the build running in this process, None when nothing is recorded
+_active_stats = None
+
+
+class _StageRecord:
+    __slots__ = ('bytes',)
+
+    def __init__(self, nbytes):
+        self.bytes = nbytes
+
+
+@contextlib.contextmanager
+def stage(name, nbytes=0):
+    """Time a block as one occurrence of a build stage, set .bytes on the result to count data"""
+    record = _StageRecord(nbytes)
+    stats = _active_stats
+    if stats is None:
+        yield record
+        return
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        stats.add(name, time.perf_counter() - start, 1, record.bytes)
+
+
+def run_measured(render, item):
+    """render(item) plus the stages it recorded, runs in a worker process"""
+    with BuildStats() as stats:
+        result = render(item)
+    return result, stats.stages
+
+
+class MemorySink:
+    """Keeps the summary of the last build of every label, for the GUI"""
+
+    def __init__(self):
+        self.summaries = {}
+
+    def start(self, stats):
+        pass
+
+    def finish(self, stats, summary):
+        self.summaries[stats.label] = summary
+
+    def get(self, label):
+        return self.summaries.get(label)
+
+
+class JsonLogSink:
+    """Appends every build summary as one JSON line to a log file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def start(self, stats):
+        pass
+
+    def finish(self, stats, summary):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        record = dict(summary, finished=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+class ProfileSink:
+    """Runs cProfile over each build and dumps one .prof file per label
+
+    Only the calling process is profiled, work done in render workers shows up
+    as time spent waiting on their results.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._profiles = {}
+
+    def start(self, stats):
+        profile = cProfile.Profile()
+        self._profiles[id(stats)] = profile
+        profile.enable()
+
+    def finish(self, stats, summary):
+        profile = self._profiles.pop(id(stats))
+        profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, f"{stats.label or 'build'}.prof"))
+
+
+def format_stats(summary):
+    """Human readable lines of a build summary, slowest stage first"""
+    lines = [f"Last build: {summary['seconds']:.2f}s"]
+    stages = sorted(summary['stages'].items(), key=lambda item: -item[1]['seconds'])
+    for name, totals in stages:
+        line = f"{name}: {totals['seconds']:.2f}s, {totals['count']}x"
+        if totals['bytes']:
+            line += f", {totals['bytes'] / (1024 * 1024):.1f} MB"
+        lines.append(line)
+    return lines
+
+
+# Summaries of the builds done in this process, keyed by game id
+build_summaries = MemorySink()
+
+
+class ThumbnailCache:
+    """On-disk store of gallery thumbnails keyed by the content hash of the source"""
+
+    def __init__(self, cache_dir=os.path.join('cache', 'thumbnails')):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._index = None
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def content_hash(self, image_path):
+        """Hash of the file contents, only recomputed when mtime or size change"""
+        stat = os.stat(image_path)
+        key = os.path.abspath(image_path)
+        with self._lock:
+            entry = self._load_index().get(key)
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['hash']
+
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        with self._lock:
+            self._load_index()[key] = {
+                'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': content_hash}
+            self._dirty = True
+        return content_hash
+
+    def get(self, image_path, width):
+        thumbnail_path = os.path.join(
+            self.cache_dir, f"{self.content_hash(image_path)}-{width}.png")
+        try:
+            with Image.open(thumbnail_path) as thumbnail:
+                thumbnail.load()
+                return thumbnail
+        except (OSError, ValueError):
+            pass
+
+        thumbnail = resize_image(image_path, width)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write under a temporary name so a crash never leaves a truncated thumbnail
+        temp_path = f"{thumbnail_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        thumbnail.save(temp_path, 'PNG')
+        os.replace(temp_path, thumbnail_path)
+        return thumbnail
+
+    def flush(self):
+        """Persist the hash index, call after a batch of lookups"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Several build processes may flush at once, each needs its own temp file
+            temp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, self.index_path)
+            self._dirty = False
+
+
+thumbnail_cache = ThumbnailCache()
+
+
+def create_circular_mask(size):
+    mask = Image.new("L", size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0) + size, fill=255, outline=(0,))
+    return mask
+
+
+class IconCache:
+    """LRU cache of decoded, pre-sized RGBA icons shared by every card render"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.atlas_hits = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        # atlas path -> IconAtlas consulted before decoding
+        self._atlases = {}
+        self._lock = threading.Lock()
+
+    def get(self, image_path, max_size):
+        # mtime is part of the key so an edited file is never served stale
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, max_size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+            atlases = list(self._atlases.values())
+
+        # Icons in an attached atlas are already sized, they need no decoding and no copy
+        for atlas in atlases:
+            image = atlas.get(key)
+            if image is not None:
+                with self._lock:
+                    self.atlas_hits += 1
+                return image
+
+        with self._lock:
+            self.misses += 1
+        with stage('decode', stat.st_size):
+            image = Image.open(image_path).convert("RGBA")
+        with stage('thumbnail') as record:
+            image.thumbnail((max_size, max_size))
+            record.bytes = image.width * image.height * 4
+        self.put(key, image)
+        return image
+
+    def put(self, key, image):
+        size = image.width * image.height * 4
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = image
+            self.current_bytes += size
+            # Evict least recently used icons, but always keep the newest one
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.width * evicted.height * 4
+
+    def attach(self, atlas):
+        """Serve icons from an IconAtlas, attaching the same path again is a no-op"""
+        with self._lock:
+            self._atlases.setdefault(atlas.path, atlas)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._atlases.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.atlas_hits = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'atlas_hits': self.atlas_hits,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+            }
+
+
+# Process-wide icon cache, create_pdf repeats the same files on every page
+icon_cache = IconCache()
+
+
+class IconAtlas:
+    """One file of pre-sized raw RGBA icons that renderers memory-map instead of decoding
+
+    The file is a magic header, the pixel data and a JSON index of where each
+    icon is, followed by the index length. Icons are keyed like the icon cache,
+    by absolute path, mtime and size, so an edited image just isn't found.
+    Pickling keeps only the path, a worker process maps the file itself.
+    """
+
+    MAGIC = b'ICONATL1'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._map = None
+        # (path, mtime_ns, size) -> (offset, width, height)
+        self._entries = None
+        self._images = {}
+
+    def __reduce__(self):
+        return icon_atlas, (self.path,)
+
+    def _load(self):
+        # Icons already handed out keep the old mapping alive until they are dropped
+        self._map = None
+        self._entries = {}
+        self._images = {}
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing or empty, the next ensure() builds it
+            return
+        if mapped[:len(self.MAGIC)] != self.MAGIC or len(mapped) < len(self.MAGIC) + 8:
+            return
+        index_length = int.from_bytes(mapped[-8:], 'little')
+        index = json.loads(mapped[len(mapped) - 8 - index_length:len(mapped) - 8])
+        for path, mtime_ns, size, offset, width, height in index['entries']:
+            self._entries[(path, mtime_ns, size)] = (offset, width, height)
+        self._map = mapped
+
+    def get(self, key):
+        """The icon for an icon cache key as a read-only view of the mapping, or None"""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            image = self._images.get(key)
+            if image is None:
+                entry = self._entries.get(key)
+                if entry is None:
+                    return None
+                offset, width, height = entry
+                view = memoryview(self._map)[offset:offset + width * height * 4]
+                image = Image.frombuffer('RGBA', (width, height), view, 'raw', 'RGBA', 0, 1)
+                self._images[key] = image
+            return image
+
+    def ensure(self, image_paths, sizes):
+        """Add the icons the atlas is missing, True if it had to be rewritten
+
+        Icons of images still in the set are kept at every size, so builds at
+        other resolutions don't keep replacing each other's icons. Only edited
+        images and images no longer in the set are dropped.
+        """
+        mtimes = {os.path.abspath(image_path): os.stat(image_path).st_mtime_ns
+                  for image_path in image_paths}
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            missing = [(path, mtime_ns, size) for path, mtime_ns in mtimes.items()
+                       for size in dict.fromkeys(sizes)
+                       if (path, mtime_ns, size) not in self._entries]
+            if not missing:
+                return False
+            kept = [key for key in self._entries if mtimes.get(key[0]) == key[1]]
+            self._build(kept, missing)
+            self._load()
+        return True
+
+    def _build(self, kept, missing):
+        sizes_by_path = OrderedDict()
+        for path, mtime_ns, size in missing:
+            sizes_by_path.setdefault((path, mtime_ns), []).append(size)
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entries = []
+        try:
+            with stage('atlas_build') as record, open(temp_path, 'wb') as f:
+                f.write(self.MAGIC)
+                # Icons that are still valid are copied over as they are
+                for key in kept:
+                    offset, width, height = self._entries[key]
+                    entries.append([*key, f.tell(), width, height])
+                    f.write(self._map[offset:offset + width * height * 4])
+                for (path, mtime_ns), sizes in sizes_by_path.items():
+                    # Decoded once, then sized exactly like IconCache.get does
+                    with Image.open(path) as source:
+                        source = source.convert("RGBA")
+                    for size in sizes:
+                        image = source.copy()
+                        image.thumbnail((size, size))
+                        entries.append([path, mtime_ns, size, f.tell(), image.width, image.height])
+                        f.write(image.tobytes())
+                record.bytes = f.tell()
+                index = json.dumps({'entries': entries}).encode()
+                f.write(index)
+                f.write(len(index).to_bytes(8, 'little'))
+            # Drop this process's mapping first, some platforms refuse to replace mapped files
+            self._map = None
+            self._images = {}
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+@functools.lru_cache(maxsize=None)
+def icon_atlas(path):
+    """The process-wide IconAtlas for a file, so its mapping is shared by every build"""
+    return IconAtlas(path)
+
+
+def icon_positions(num_images, circle_diameter, scale=1):
+    """Top-left corner of every icon on a card, shared by the raster and vector engines"""
+    angle_step = 360 / num_images
+    radius = circle_diameter // 2  # adjust radius for distance to center
+    radius = radius - round(30 * scale)
+
+    positions = []
+    for i in range(num_images):
+        angle = i * angle_step
+        x = radius + int(radius * math.cos(math.radians(angle)))
+        y = radius + int(radius * math.sin(math.radians(angle)))
+        positions.append((x, y))
+    return positions
+
+
+# Layout styles a card can use, ring is the classic look
+LAYOUT_STYLES = ('ring', 'grid', 'multi-ring', 'random')
+
+# Random placement: share of the card covered by icons, occupancy cells across a card
+# (3 points each on the default card) and the sizes an icon may get relative to its
+# slot, tried largest first
+RANDOM_FILL = 0.55
+RANDOM_CELLS = 60
+RANDOM_SIZES = (1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3)
+RANDOM_ATTEMPTS = 80
+
+
+def ring_slots(count, center, radius, size):
+    """count slots of the given size centered on a circle around center"""
+    slots = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count - math.pi / 2
+        x = center + radius * math.cos(angle) - size / 2
+        y = center + radius * math.sin(angle) - size / 2
+        slots.append((round(x), round(y), size))
+    return slots
+
+
+def ring_fit(count, radius, max_size):
+    """Largest square icon that fits count times around a circle, capped at max_size"""
+    if count < 2:
+        return max_size
+    # Squares can't touch when their centers are at least a diagonal apart
+    return min(max_size, int(2 * radius * math.sin(math.pi / count) / math.sqrt(2)))
+
+
+class CardLayout:
+    """Slot geometry, mask and cut line of one kind of card
+
+    Everything here depends only on the card size, the number of symbols and
+    the layout style, so a single instance serves every card of a deck and
+    rendering a card comes down to pasting its icons.
+    """
+
+    def __init__(self, circle_diameter, num_symbols, style='ring', scale=1):
+        if style not in LAYOUT_STYLES:
+            raise ValueError(f"Unknown card layout: {style}")
+        self.circle_diameter = circle_diameter
+        self.num_symbols = num_symbols
+        self.style = style
+        # Ring icons hang from their position as they always have, the newer styles
+        # center each icon in its slot
+        self.centered = style != 'ring'
+        # Random cards only share the icon size here, see place_randomly
+        self.randomized = style == 'random'
+        # (x, y, size) of the square box each icon is fitted into
+        self.slots = {
+            'ring': self._ring_layout,
+            'grid': self._grid_layout,
+            'multi-ring': self._multi_ring_layout,
+            'random': self._random_layout,
+        }[style](circle_diameter, num_symbols, scale)
+        if self.randomized:
+            # Cells and the one-cell gap between icons shrink with the card
+            self.cell = max(1, round(circle_diameter / RANDOM_CELLS))
+            self.cells, self.outside_cells = self._outside_cells(circle_diameter, self.cell)
+
+        # Pasted over a finished card: outside the circle turns transparent white,
+        # the cut line is drawn on top
+        size = (circle_diameter, circle_diameter)
+        self.frame = Image.new("RGBA", size, (255, 255, 255, 0))
+        self.frame_mask = ImageOps.invert(create_circular_mask(size))
+        overshoot = round(5 * scale)
+        box = (-overshoot, -overshoot, circle_diameter + overshoot, circle_diameter + overshoot)
+        width = max(1, round(scale))
+        ImageDraw.Draw(self.frame).ellipse(box, outline='black', width=width)
+        ImageDraw.Draw(self.frame_mask).ellipse(box, outline=255, width=width)
+
+    @property
+    def max_slot_size(self):
+        return max((size for _, _, size in self.slots), default=0)
+
+    @staticmethod
+    def _outside_cells(d, cell):
+        """Occupancy rows with every cell that isn't well inside the circle already taken"""
+        cells = -(-d // cell)
+        # Keep a cell of room for the cut line
+        limit = d / 2 - cell
+        rows = []
+        for row in range(cells):
+            bits = 0
+            for col in range(cells):
+                # Farthest corner of the cell from the center
+                dx = max(abs(col * cell - d / 2), abs((col + 1) * cell - d / 2))
+                dy = max(abs(row * cell - d / 2), abs((row + 1) * cell - d / 2))
+                if dx * dx + dy * dy > limit * limit:
+                    bits |= 1 << col
+            rows.append(bits)
+        return cells, tuple(rows)
+
+    @staticmethod
+    def _random_layout(d, n, scale):
+        size = min(d // 3, int(math.sqrt(RANDOM_FILL * math.pi * (d / 2) ** 2 / max(1, n))))
+        middle = (d - size) // 2
+        return [(middle, middle, size)] * n
+
+    @staticmethod
+    def _ring_layout(d, n, scale):
+        size = d // 3
+        return [(x, y, size) for x, y in icon_positions(n, d, scale)]
+
+    @staticmethod
+    def _grid_layout(d, n, scale):
+        # Rows of equal cells inside the square inscribed in the circle
+        side = d / math.sqrt(2) * 0.95
+        cols = math.ceil(math.sqrt(n))
+        rows = math.ceil(n / cols)
+        cell = side / cols
+        size = int(cell * 0.9)
+        top = (d - rows * cell) / 2
+        slots = []
+        for row in range(rows):
+            in_row = min(cols, n - row * cols)
+            left = (d - in_row * cell) / 2
+            for col in range(in_row):
+                slots.append((round(left + col * cell + (cell - size) / 2),
+                              round(top + row * cell + (cell - size) / 2), size))
+        return slots
+
+    @staticmethod
+    def _multi_ring_layout(d, n, scale):
+        # One icon in the middle, the rest on one ring, or on two for bigger cards
+        center = d / 2
+        diagonal = math.sqrt(2)
+        gap = max(2, d // 60)
+        if n <= 1:
+            size = int(d * 0.4)
+            return [(round(center - size / 2), round(center - size / 2), size)][:n]
+        rest = n - 1
+        inner = max(3, round(rest * 0.4)) if rest > 11 else 0
+        outer = rest - inner
+
+        # Each ring sits as far out as its icons allow, shrinking them until they fit
+        size = int(d * (0.2 if inner else 0.24))
+        for _ in range(3):
+            size = ring_fit(outer, d / 2 - size / diagonal - gap, size)
+        radius = d / 2 - size / diagonal - gap
+        slots = ring_slots(outer, center, radius, size)
+        if inner:
+            outer_radius, outer_size = radius, size
+            size = int(d * 0.16)
+            for _ in range(3):
+                size = ring_fit(inner, outer_radius - (outer_size + size) / diagonal - gap, size)
+            radius = outer_radius - (outer_size + size) / diagonal - gap
+            slots += ring_slots(inner, center, radius, size)
+
+        # The middle icon takes what the innermost ring leaves free
+        middle_size = max(1, int(min(d * 0.3, (radius - gap) * diagonal - size)))
+        middle = round(center - middle_size / 2)
+        return slots + [(middle, middle, middle_size)]
+
+
+@functools.lru_cache(maxsize=64)
+def card_layout(circle_diameter, num_symbols, style='ring', scale=1):
+    """The shared CardLayout for these parameters, built on first use"""
+    with stage('layout'):
+        return CardLayout(circle_diameter, num_symbols, style, scale)
+
+
+def alpha_footprint(image, cell):
+    """Occupancy rows of the cells an icon's alpha covers, as ints with one bit per cell
+
+    Two footprints are returned with the same origin and one empty cell of
+    padding all round: the exact cells, and the cells grown by one in every
+    direction, which keeps a gap between neighbours when testing.
+    """
+    alpha = image.getchannel('A').reduce(cell)
+    width, height = alpha.size
+    data = alpha.tobytes()
+    rows = [0]
+    for y in range(height):
+        bits = 0
+        for x, value in enumerate(data[y * width:(y + 1) * width]):
+            if value:
+                bits |= 1 << (x + 1)
+        rows.append(bits)
+    rows.append(0)
+
+    spread = [row | row << 1 | row >> 1 for row in rows]
+    grown = [spread[i] | (spread[i - 1] if i else 0) | (spread[i + 1] if i + 1 < len(rows) else 0)
+             for i in range(len(rows))]
+    return rows, grown
+
+
+def find_spot(occupied, footprint, cells, rng, attempts, scan=False):
+    """Random free cell position for a footprint, or None after the given attempts
+
+    With scan, every position is tried before giving up, starting from a
+    random one so the leftovers don't all gather in a corner.
+    """
+    max_x = cells - max(row.bit_length() for row in footprint)
+    max_y = cells - len(footprint)
+    if max_x < 0 or max_y < 0:
+        return None
+    for _ in range(attempts):
+        x = rng.randint(0, max_x)
+        y = rng.randint(0, max_y)
+        if not any(occupied[y + i] & (row << x) for i, row in enumerate(footprint)):
+            return x, y
+    if scan:
+        positions = (max_x + 1) * (max_y + 1)
+        start = rng.randrange(positions)
+        for position in range(start, start + positions):
+            y, x = divmod(position % positions, max_x + 1)
+            if not any(occupied[y + i] & (row << x) for i, row in enumerate(footprint)):
+                return x, y
+    return None
+
+
+def fallback_placements(image_paths, circle_diameter):
+    """Upright icons on the grid layout, for cards too crowded to place randomly"""
+    geometry = card_layout(circle_diameter, len(image_paths), 'grid')
+    return [(x + size / 2, y + size / 2, size, 0) for x, y, size in geometry.slots]
+
+
+def place_randomly(image_paths, circle_diameter, seed=0):
+    """Random, non-overlapping (center x, center y, size, angle) of every icon on a card
+
+    Works in points (72 dpi) so every engine and resolution gets the same card.
+    The same images and seed always give the same placement. Collisions are
+    tested on a coarse occupancy bitmap built from each rotated icon's alpha,
+    where a test is a handful of integer ANDs. A card whose icons don't all
+    fit, even at the smallest size, falls back to upright icons on the grid.
+    """
+    geometry = card_layout(circle_diameter, len(image_paths), 'random')
+    cell = geometry.cell
+    occupied = list(geometry.outside_cells)
+    # Seeded by the card's images, so it doesn't matter which worker renders it
+    rng = random.Random(f"{seed}:{'|'.join(image_paths)}")
+
+    placements = []
+    with stage('placement'):
+        for image_path, (_, _, slot_size) in zip(image_paths, geometry.slots):
+            angle = rng.uniform(0, 360)
+            # Start at a random one of the larger sizes, shrink while there's no room
+            first = rng.randrange(4)
+            factors = RANDOM_SIZES[first:]
+            for factor in factors:
+                size = max(1, round(slot_size * factor))
+                icon = icon_cache.get(image_path, size)
+                rotated = icon.rotate(angle, expand=True, resample=Image.Resampling.BICUBIC)
+                rows, grown = alpha_footprint(rotated, cell)
+                # Random tries miss the last gaps, the smallest size looks everywhere
+                spot = find_spot(occupied, grown, geometry.cells, rng, RANDOM_ATTEMPTS,
+                                 scan=factor == factors[-1])
+                if spot is not None:
+                    break
+            else:
+                return fallback_placements(image_paths, circle_diameter)
+
+            x, y = spot
+            for i, row in enumerate(rows):
+                occupied[y + i] |= row << x
+            # The footprint's padding cell sits before the image
+            left = (x + 1) * cell
+            top = (y + 1) * cell
+            placements.append((left + rotated.width / 2, top + rotated.height / 2, size, angle))
+    return placements
+
+
+def card_icons(image_paths, geometry, scale=1, seed=0):
+    """(icon, x, y) of every icon on a card, ready to paste at its top-left corner"""
+    if geometry.randomized:
+        placements = place_randomly(
+            image_paths, round(geometry.circle_diameter / scale), seed)
+        for image_path, (cx, cy, size, angle) in zip(image_paths, placements):
+            image = icon_cache.get(image_path, round(size * scale)).rotate(
+                angle, expand=True, resample=Image.Resampling.BICUBIC)
+            yield (image, round(cx * scale - image.width / 2),
+                   round(cy * scale - image.height / 2))
+    else:
+        for image_path, (x, y, size) in zip(image_paths, geometry.slots):
+            image = icon_cache.get(image_path, size)
+            if geometry.centered:
+                x += (size - image.width) // 2
+                y += (size - image.height) // 2
+            yield image, x, y
+
+
+def create_circle_with_images(image_paths, circle_diameter, scale=1, layout='ring', seed=0):
+    """Render one card, scale is the pixels per point when rendering above 72 dpi"""
+    geometry = card_layout(circle_diameter, len(image_paths), layout, scale)
+    circle_image = Image.new(
+        "RGBA", (circle_diameter, circle_diameter), (255, 255, 255, 255))
+
+    for image, x, y in card_icons(image_paths, geometry, scale, seed):
+        with stage('icon_paste'):
+            circle_image.paste(image, (x, y), image)
+
+    with stage('composite', circle_diameter * circle_diameter * 4):
+        circle_image.paste(geometry.frame, (0, 0), geometry.frame_mask)
+
+    return circle_image
+
+
+# How cards are blended onto the page, 'numpy' needs NumPy installed
+COMPOSITORS = ('pillow', 'numpy')
+
+
+def import_numpy():
+    """NumPy, imported on first use, or None when it isn't installed"""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            return None
+        numpy = module
+    return numpy
+
+
+def div255(value):
+    """value / 255 rounded, the way Image.paste rounds its blends"""
+    value = value + 128
+    return ((value >> 8) + value) >> 8
+
+
+@functools.lru_cache(maxsize=64)
+def card_arrays(geometry):
+    """Inside-the-circle mask and cut line pixels of a CardLayout, for ArrayCompositor"""
+    mask = numpy.asarray(geometry.frame_mask)
+    line = numpy.asarray(geometry.frame.getchannel('A')) == 255
+    cut_line = numpy.nonzero((mask == 255) & line)
+    line_colors = [numpy.asarray(band)[cut_line] for band in geometry.frame.split()[:3]]
+    return mask == 0, cut_line, line_colors
+
+
+class ArrayCompositor:
+    """Draws cards straight into a white NumPy page, one plane per color channel
+
+    create_circle_with_images builds an image per card, composites its frame
+    over every pixel and then the card gets pasted onto the page. Here icons
+    are blended, with Image.paste's own integer formula, into color and alpha
+    planes that are reused from card to card, and only the pixels under icons
+    are written to the page. The rest of a card is the page's white already
+    and the cut line is set through indices cached per kind of card. Planes
+    keep every operation on contiguous rows, interleaved RGB is several times
+    slower in NumPy. The result is the same pixels as pasting
+    create_circle_with_images onto a white page.
+    """
+
+    def __init__(self, width, height):
+        import_numpy()
+        self.planes = numpy.full((3, height, width), 255, numpy.uint8)
+        # card size -> (color planes, alpha plane), white and opaque between cards
+        self._scratch = {}
+
+    def image(self):
+        return Image.merge('RGB', [Image.fromarray(plane) for plane in self.planes])
+
+    def _card_scratch(self, circle_diameter):
+        scratch = self._scratch.get(circle_diameter)
+        if scratch is None:
+            scratch = (numpy.full((3, circle_diameter, circle_diameter), 255, numpy.uint8),
+                       numpy.full((circle_diameter, circle_diameter), 255, numpy.uint8))
+            self._scratch[circle_diameter] = scratch
+        return scratch
+
+    def draw(self, image_paths, left, top, circle_diameter, scale=1, layout='ring', seed=0,
+             return_card=False):
+        """Draw a card with its top-left corner at (left, top), optionally returning it as RGBA"""
+        geometry = card_layout(circle_diameter, len(image_paths), layout, scale)
+        inside, cut_line, line_colors = card_arrays(geometry)
+        color, alpha = self._card_scratch(circle_diameter)
+
+        boxes = []
+        for image, x, y in card_icons(image_paths, geometry, scale, seed):
+            # Clipped to the card like paste does
+            x0, y0 = max(x, 0), max(y, 0)
+            x1 = min(x + image.width, circle_diameter)
+            y1 = min(y + image.height, circle_diameter)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            box = (slice(y0, y1), slice(x0, x1))
+            crop = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+            with stage('icon_paste'):
+                *bands, icon_alpha = [numpy.asarray(band)[crop] for band in image.split()]
+                icon_alpha = icon_alpha.astype(numpy.uint16)
+                inverse = 255 - icon_alpha
+                for plane, band in zip(color, bands):
+                    plane[box] = div255(plane[box] * inverse + band * icon_alpha)
+                alpha[box] = div255(alpha[box] * inverse + icon_alpha * icon_alpha)
+            boxes.append(box)
+
+        with stage('composite'):
+            page = self.planes[:, top:top + circle_diameter, left:left + circle_diameter]
+            # The card over the white page, wherever the frame leaves it showing
+            for box in boxes:
+                card_alpha = alpha[box].astype(numpy.uint16)
+                white = 255 * (255 - card_alpha)
+                for page_plane, plane in zip(page, color):
+                    numpy.copyto(page_plane[box], div255(plane[box] * card_alpha + white),
+                                 casting='unsafe', where=inside[box])
+            for page_plane, line_color in zip(page, line_colors):
+                page_plane[cut_line] = line_color
+
+        card = None
+        if return_card:
+            card = self._card_image(color, alpha, inside, cut_line, line_colors)
+        for box in boxes:
+            color[:, box[0], box[1]] = 255
+            alpha[box] = 255
+        return card
+
+    @staticmethod
+    def _card_image(color, alpha, inside, cut_line, line_colors):
+        # What create_circle_with_images returns, for the card cache
+        card = numpy.concatenate([color, alpha[None]])
+        card[:, ~inside] = numpy.array([255, 255, 255, 0], numpy.uint8)[:, None]
+        for plane, value in zip(card, [*line_colors, 255]):
+            plane[cut_line] = value
+        return Image.merge('RGBA', [Image.fromarray(plane) for plane in card])
+
+    def paste(self, card, left, top):
+        """Blend a finished RGBA card into the page, like Image.paste with its own alpha"""
+        with stage('page_paste'):
+            *bands, card_alpha = [numpy.asarray(band) for band in card.convert('RGBA').split()]
+            card_alpha = card_alpha.astype(numpy.uint16)
+            inverse = 255 - card_alpha
+            page = self.planes[:, top:top + card.height, left:left + card.width]
+            for page_plane, band in zip(page, bands):
+                page_plane[...] = div255(page_plane * inverse + band * card_alpha)
+
+
+def is_prime(n):
+    return n >= 2 and all(n % d for d in range(2, math.isqrt(n) + 1))
+
+
+@functools.lru_cache(maxsize=None)
+def projective_plane(order):
+    """Cards of the projective plane of prime order n as tuples of symbol indices
+
+    There are n*n + n + 1 cards and as many symbols, every card holds n + 1
+    symbols and any two cards share exactly one of them.
+    """
+    if not is_prime(order):
+        raise ValueError(f"Deck order must be a prime number, got {order}")
+    n = order
+    # Symbols 0..n are the points at infinity, n+1+n*x+y is the point (x, y)
+    cards = [tuple(range(n + 1))]
+    # Vertical lines x = c all meet in the point at infinity 0
+    for c in range(n):
+        cards.append((0,) + tuple(n + 1 + n * c + y for y in range(n)))
+    # Lines y = slope*x + intercept meet in the point at infinity slope + 1
+    for slope in range(n):
+        for intercept in range(n):
+            cards.append((slope + 1,) + tuple(
+                n + 1 + n * x + (slope * x + intercept) % n for x in range(n)))
+    return tuple(cards)
+
+
+# Largest deck built unless asked for: the standard 57 cards of 8 symbols. Bigger
+# orders put more icons on a card than the layouts can keep readable
+DECK_ORDER = 7
+
+
+def deck_order_for(num_images, max_order=None):
+    """Largest prime order whose n*n + n + 1 symbols are covered by the images"""
+    order = None
+    n = 2
+    while n * n + n + 1 <= num_images and (max_order is None or n <= max_order):
+        if is_prime(n):
+            order = n
+        n += 1
+    if order is None:
+        raise ValueError(f"At least 7 images are needed to build a deck, got {num_images}")
+    return order
+
+
+class Deck:
+    """Projective-plane deck mapping symbol indices to a game's image files"""
+
+    def __init__(self, image_files, order=None, max_order=DECK_ORDER):
+        self.order = order or deck_order_for(len(image_files), max_order)
+        self.num_symbols = self.order * self.order + self.order + 1
+        if len(image_files) < self.num_symbols:
+            raise ValueError(f"A deck of order {self.order} needs {self.num_symbols} "
+                             f"images, got {len(image_files)}")
+        self.symbols = list(image_files[:self.num_symbols])
+        # Images past the last symbol are left out of the deck
+        self.unused_images = len(image_files) - self.num_symbols
+        self.cards = projective_plane(self.order)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def validate(self):
+        report = validate_deck(self.cards, self.num_symbols)
+        report.unused_images = self.unused_images
+        return report
+
+    def __iter__(self):
+        # Image lists are built card by card as the renderer asks for them
+        for card in self.cards:
+            yield [self.symbols[symbol] for symbol in card]
+
+
+class DeckReport:
+    """Result of validate_deck"""
+
+    # Only the first violations are kept, a broken deck can have millions of them
+    MAX_VIOLATIONS = 100
+
+    def __init__(self, num_cards, symbol_counts):
+        self.num_cards = num_cards
+        self.symbol_counts = symbol_counts
+        self.violations = []
+        self.num_violations = 0
+        self.unused_images = 0
+
+    @property
+    def is_valid(self):
+        return self.num_violations == 0
+
+    @property
+    def imbalance(self):
+        """Spread between the most and least used symbol, 0 for a balanced deck"""
+        if not self.symbol_counts:
+            return 0
+        return max(self.symbol_counts) - min(self.symbol_counts)
+
+    def summary(self):
+        summary = (f"{self.num_cards} cards, {self.num_violations} card pairs not sharing "
+                   f"exactly one symbol, symbol usage imbalance {self.imbalance}")
+        if self.unused_images:
+            summary += f", {self.unused_images} images unused"
+        return summary
+
+
+def validate_deck(cards, num_symbols):
+    """Check that any two cards share exactly one symbol using integer bitmasks"""
+    masks = []
+    symbol_counts = [0] * num_symbols
+    for card in cards:
+        mask = 0
+        for symbol in card:
+            mask |= 1 << symbol
+            symbol_counts[symbol] += 1
+        masks.append(mask)
+
+    report = DeckReport(len(masks), symbol_counts)
+    for i, mask in enumerate(masks):
+        for j in range(i + 1, len(masks)):
+            shared = (mask & masks[j]).bit_count()
+            if shared != 1:
+                report.num_violations += 1
+                if len(report.violations) < report.MAX_VIOLATIONS:
+                    report.violations.append((i, j, shared))
+    return report
+
+
+# Bump when the card rendering changes so cached cards are not reused
+CARD_RENDER_VERSION = 1
+
+
+class CardCache:
+    """On-disk store of rendered cards keyed by the content of their inputs"""
+
+    def __init__(self, cache_dir=os.path.join('cache', 'cards')):
+        self.cache_dir = cache_dir
+
+    def key(self, image_paths, *params):
+        """Hash of the images on the card, in order, plus the layout parameters"""
+        digest = hashlib.sha256()
+        for image_path in image_paths:
+            digest.update(thumbnail_cache.content_hash(image_path).encode())
+        digest.update(repr((CARD_RENDER_VERSION,) + params).encode())
+        return digest.hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    def load(self, key, extension):
+        try:
+            with open(self.path(key, extension), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, key, extension, data):
+        path = self.path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Workers may render the same card concurrently, the rename keeps files whole
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def warm(self, image_paths):
+        """Hash every image up front so worker processes find them in the index"""
+        for image_path in image_paths:
+            thumbnail_cache.content_hash(image_path)
+        thumbnail_cache.flush()
+
+
+card_cache = CardCache()
+
+
+def load_cached_card(card_cache, key):
+    data = card_cache.load(key, 'png')
+    if data is None:
+        return None
+    with stage('card_cache_load', len(data)):
+        circle_image = Image.open(io.BytesIO(data))
+        circle_image.load()
+    return circle_image
+
+
+def store_cached_card(card_cache, key, circle_image):
+    with stage('card_cache_store') as record:
+        buffer = io.BytesIO()
+        circle_image.save(buffer, 'PNG')
+        card_cache.store(key, 'png', buffer.getvalue())
+        record.bytes = buffer.tell()
+
+
+def render_cached_card(circle_images, circle_diameter, card_cache=None, layout='ring', seed=0):
+    """create_circle_with_images, served from the card cache when possible"""
+    if card_cache is None:
+        return create_circle_with_images(circle_images, circle_diameter, layout=layout, seed=seed)
+
+    key = card_cache.key(circle_images, circle_diameter, layout, seed)
+    circle_image = load_cached_card(card_cache, key)
+    if circle_image is None:
+        circle_image = create_circle_with_images(circle_images, circle_diameter, layout=layout,
+                                                 seed=seed)
+        store_cached_card(card_cache, key, circle_image)
+    return circle_image
+
+
+def draw_cached_card(arrays, circle_images, left, top, circle_diameter, card_cache=None,
+                     layout='ring', seed=0):
+    """render_cached_card for an ArrayCompositor, both share the same cached cards"""
+    if card_cache is None:
+        arrays.draw(circle_images, left, top, circle_diameter, layout=layout, seed=seed)
+        return
+
+    key = card_cache.key(circle_images, circle_diameter, layout, seed)
+    circle_image = load_cached_card(card_cache, key)
+    if circle_image is not None:
+        arrays.paste(circle_image, left, top)
+    else:
+        store_cached_card(card_cache, key, arrays.draw(
+            circle_images, left, top, circle_diameter, layout=layout, seed=seed,
+            return_card=True))
+
+
+# Sheet sizes in points (1 point = 1/72 inch)
+PAPER_SIZES = {
+    'a4': (595, 842),
+    'a3': (842, 1191),
+    'letter': (612, 792),
+    'legal': (612, 1008),
+}
+# Points across a card's cut line
+CARD_DIAMETER = 183
+# Room kept clear around each cut line, neighbouring cards end up twice this apart
+CARD_BLEED = 7.5
+PACKINGS = ('square', 'hex')
+
+
+class Imposition:
+    """Where the cards go on a sheet, in the packing that fits the most of them
+
+    Every card takes up a circle of its diameter plus the bleed all round.
+    Those circles are packed either in a square grid or in hexagonal rows or
+    columns, offset by half a card, and the densest packing wins. Ties go to
+    the square grid, which cuts with straight lines. The packing is centered
+    on the sheet.
+    """
+
+    def __init__(self, page_width, page_height, circle_diameter, bleed=CARD_BLEED,
+                 packing=None):
+        if packing is not None and packing not in PACKINGS:
+            raise ValueError(f"Unknown packing: {packing}")
+        self.page_width = page_width
+        self.page_height = page_height
+        self.circle_diameter = circle_diameter
+        self.bleed = bleed
+
+        pitch = circle_diameter + 2 * bleed
+        candidates = []
+        if packing in (None, 'square'):
+            candidates.append(('square', self._square(page_width, page_height, pitch)))
+        if packing in (None, 'hex'):
+            candidates.append(('hex', self._hex(page_width, page_height, pitch)))
+            # Columns instead of rows, by packing the sheet turned sideways
+            candidates.append(('hex', [(y, x) for x, y in
+                                       self._hex(page_height, page_width, pitch)]))
+        self.packing, centers = max(candidates, key=lambda candidate: len(candidate[1]))
+        if not centers:
+            raise ValueError(f"A {circle_diameter} point card with {bleed} points of bleed "
+                             f"doesn't fit on a {page_width}x{page_height} sheet")
+
+        # Centered on the sheet, as top-left corners of the cards
+        span_x = max(x for x, _ in centers) + min(x for x, _ in centers)
+        span_y = max(y for _, y in centers) + min(y for _, y in centers)
+        offset_x = (page_width - span_x) / 2 - circle_diameter / 2
+        offset_y = (page_height - span_y) / 2 - circle_diameter / 2
+        self.positions = [(x + offset_x, y + offset_y) for x, y in centers]
+
+    @property
+    def cards_per_page(self):
+        return len(self.positions)
+
+    @staticmethod
+    def _square(width, height, pitch):
+        columns = int(width // pitch)
+        rows = int(height // pitch)
+        return [(pitch / 2 + col * pitch, pitch / 2 + row * pitch)
+                for row in range(rows) for col in range(columns)]
+
+    @staticmethod
+    def _hex(width, height, pitch):
+        # Rows nest into each other's gaps, a row height of pitch * sqrt(3) / 2 apart
+        row_pitch = pitch * math.sqrt(3) / 2
+        rows = int((height - pitch) // row_pitch) + 1 if height >= pitch else 0
+        centers = []
+        for row in range(rows):
+            shift = pitch / 2 if row % 2 else 0
+            columns = int((width - shift) // pitch)
+            centers.extend((shift + pitch / 2 + col * pitch, pitch / 2 + row * row_pitch)
+                           for col in range(columns))
+        return centers
+
+    def origin(self, index):
+        """Bottom-left corner of a card in PDF points, the y axis points up"""
+        left, top = self.positions[index]
+        return left, self.page_height - top - self.circle_diameter
+
+
+@functools.lru_cache(maxsize=32)
+def impose(paper='a4', circle_diameter=CARD_DIAMETER, bleed=CARD_BLEED, packing=None):
+    """The shared Imposition of cards on a sheet, computed on first use"""
+    if paper not in PAPER_SIZES:
+        raise ValueError(f"Unknown paper size: {paper}")
+    with stage('imposition'):
+        return Imposition(*PAPER_SIZES[paper], circle_diameter, bleed, packing)
+
+
+# Worker processes used per PDF build, 1 keeps the serial path for debugging
+PDF_RENDER_WORKERS = os.cpu_count() or 1
+# Workers start from a fresh interpreter: forked from a threaded process, like the GUI
+# while gallery threads hash thumbnails, they could inherit a held lock and hang on it
+RENDER_MP_CONTEXT = multiprocessing.get_context('spawn')
+
+
+def render_page(page_image_groups, imposition, card_cache=None, layout='ring', seed=0,
+                icon_atlas=None, compositor='pillow'):
+    """Render one page of cards, runs in a worker process in parallel mode"""
+    if icon_atlas is not None:
+        icon_cache.attach(icon_atlas)
+    page_size = (imposition.page_width, imposition.page_height)
+    if compositor == 'numpy':
+        arrays = ArrayCompositor(*page_size)
+    else:
+        page = Image.new("RGB", page_size, "white")
+
+    circle_diameter = imposition.circle_diameter
+    for circle_images, (left, top) in zip(page_image_groups, imposition.positions):
+        # Hexagonal packings put cards between whole pixels
+        x, y = round(left), round(top)
+        if compositor == 'numpy':
+            draw_cached_card(arrays, circle_images, x, y, circle_diameter, card_cache,
+                             layout, seed)
+            continue
+        circle_image = render_cached_card(
+            circle_images, circle_diameter, card_cache, layout, seed)
+        with stage('page_paste'):
+            page.paste(circle_image, (x, y), circle_image)
+    return arrays.image() if compositor == 'numpy' else page
+
+
+class PdfWriter:
+    """Minimal PDF writer that streams every page to disk as soon as it is added"""
+
+    # Object 1 is the catalog and object 2 the page tree, both written on close
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, output_pdf):
+        self.output_pdf = output_pdf
+        # Written next to the output and renamed over it on close, so an aborted
+        # build never leaves a half-written PDF behind
+        self._temp_path = f"{output_pdf}.{os.getpid()}.{threading.get_ident()}.part"
+        self._file = open(self._temp_path, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def abort(self):
+        """Throw away everything written so far, an existing output file is kept"""
+        if not self._file.closed:
+            self._file.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._temp_path)
+
+    def _reserve_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, dictionary, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f'{obj_id} 0 obj\n'.encode())
+        if stream is None:
+            self._file.write(dictionary.encode() + b'\nendobj\n')
+            return
+        self._file.write(dictionary[:-2].encode() + f' /Length {len(stream)} >>'.encode())
+        self._file.write(b'\nstream\n' + stream + b'\nendstream\nendobj\n')
+
+    def add_page(self, page):
+        """Encode a rendered page as a full-page JPEG image, like Pillow does"""
+        if page.mode not in ('RGB', 'L'):
+            page = page.convert('RGB')
+        color_space = '/DeviceRGB' if page.mode == 'RGB' else '/DeviceGray'
+        width, height = page.size
+
+        with stage('pdf_encode') as record:
+            buffer = io.BytesIO()
+            page.save(buffer, 'JPEG')
+            record.bytes = buffer.tell()
+        image_id = self.add_jpeg(page.size, buffer.getvalue(), color_space)
+
+        self.add_content_page(width, height, f'q {width} 0 0 {height} 0 0 cm /Im0 Do Q'.encode(),
+                              {'Im0': image_id}, compress=False)
+
+    def add_jpeg(self, size, data, color_space='/DeviceRGB'):
+        """Embed already encoded JPEG data as an image XObject and return its id"""
+        width, height = size
+        image_id = self._reserve_id()
+        self._write_object(
+            image_id,
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {color_space} /BitsPerComponent 8 /Filter /DCTDecode >>',
+            data)
+        return image_id
+
+    def add_image(self, image):
+        """Embed an image XObject and return its object id, alpha becomes a soft mask"""
+        with stage('pdf_encode') as record:
+            image_id = self._add_image(image)
+            record.bytes = self._file.tell() - self._offsets[image_id]
+        return image_id
+
+    def _add_image(self, image):
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        width, height = image.size
+
+        smask = ''
+        if image.mode == 'RGBA':
+            alpha = image.getchannel('A')
+            # Fully opaque icons don't need a mask
+            if alpha.getextrema()[0] < 255:
+                smask_id = self._reserve_id()
+                self._write_object(
+                    smask_id,
+                    f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                    f'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode >>',
+                    zlib.compress(alpha.tobytes()))
+                smask = f' /SMask {smask_id} 0 R'
+            image = image.convert('RGB')
+
+        image_id = self._reserve_id()
+        self._write_object(
+            image_id,
+            f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode{smask} >>',
+            zlib.compress(image.tobytes()))
+        return image_id
+
+    def add_content_page(self, width, height, content, xobjects, compress=True):
+        """Add a page drawn by a content stream, xobjects maps resource names to ids"""
+        contents_id = self._reserve_id()
+        if compress:
+            self._write_object(contents_id, '<< /Filter /FlateDecode >>', zlib.compress(content))
+        else:
+            self._write_object(contents_id, '<< >>', content)
+
+        resources = ' '.join(f'/{name} {obj_id} 0 R' for name, obj_id in xobjects.items())
+        page_id = self._reserve_id()
+        self._write_object(
+            page_id,
+            f'<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {width} {height}] '
+            f'/Resources << /XObject << {resources} >> >> '
+            f'/Contents {contents_id} 0 R >>')
+        self._page_ids.append(page_id)
+
+    def close(self):
+        if self._file.closed:
+            return
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._write_object(
+            self.PAGES_ID,
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>')
+        self._write_object(
+            self.CATALOG_ID, f'<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>')
+
+        xref_offset = self._file.tell()
+        size = self._next_id
+        self._file.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode())
+        for obj_id in range(1, size):
+            self._file.write(f'{self._offsets[obj_id]:010d} 00000 n \n'.encode())
+        self._file.write(
+            f'trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\n'
+            f'startxref\n{xref_offset}\n%%EOF\n'.encode())
+        self._file.close()
+        os.replace(self._temp_path, self.output_pdf)
+
+
+def iter_rendered(items, render, workers=1):
+    """Yield render(item) in order while keeping only a few results in memory"""
+    workers = workers or 1
+    if workers <= 1:
+        for item in items:
+            yield render(item)
+        return
+
+    # Stages recorded in the workers travel back with their results
+    stats = _active_stats
+    if stats is not None:
+        render = functools.partial(run_measured, render)
+
+    # Bounded window of in-flight work so a fast pool can't outrun the writer
+    with ProcessPoolExecutor(max_workers=workers, mp_context=RENDER_MP_CONTEXT) as executor:
+        remaining = iter(items)
+        pending = deque(executor.submit(render, item)
+                        for item in itertools.islice(remaining, workers * 2))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                if stats is not None:
+                    result, stages = result
+                    stats.merge(stages)
+                next_item = next(remaining, None)
+                if next_item is not None:
+                    pending.append(executor.submit(render, next_item))
+                yield result
+        finally:
+            # A consumer that stops early, like a cancelled build, doesn't wait for queued work
+            for future in pending:
+                future.cancel()
+
+
+def render_print_card(circle_images, card_size, scale, card_cache=None, layout='ring', seed=0,
+                      icon_atlas=None, compositor='pillow'):
+    """Render a card at print resolution and return its JPEG, runs in a worker process"""
+    if icon_atlas is not None:
+        icon_cache.attach(icon_atlas)
+    if card_cache is not None:
+        # Cached cards go straight from disk into the PDF without any decoding
+        key = card_cache.key(circle_images, card_size, scale, PRINT_JPEG_QUALITY, layout, seed)
+        data = card_cache.load(key, 'jpg')
+        if data is not None:
+            return (card_size, card_size), data
+
+    if compositor == 'numpy':
+        arrays = ArrayCompositor(card_size, card_size)
+        arrays.draw(circle_images, 0, 0, card_size, scale, layout, seed)
+        card = arrays.image()
+        del arrays
+    else:
+        circle_image = create_circle_with_images(circle_images, card_size, scale, layout, seed)
+        # JPEG has no alpha, the corners outside the circle are page white anyway
+        card = Image.new("RGB", circle_image.size, "white")
+        with stage('page_paste'):
+            card.paste(circle_image, (0, 0), circle_image)
+        del circle_image
+
+    with stage('pdf_encode') as record:
+        buffer = io.BytesIO()
+        card.save(buffer, 'JPEG', quality=PRINT_JPEG_QUALITY)
+        record.bytes = buffer.tell()
+    if card_cache is not None:
+        card_cache.store(key, 'jpg', buffer.getvalue())
+    return card.size, buffer.getvalue()
+
+
+def render_card_file(circle_images, card_size, scale, image_format='png', card_cache=None,
+                     layout='ring', seed=0, icon_atlas=None, compositor='pillow'):
+    """Render a card for export and return the encoded file, runs in a worker process
+
+    JPEG cards are the ones create_pdf(dpi=...) prints, PNG cards keep the
+    corners outside the circle transparent.
+    """
+    if image_format == 'jpeg':
+        return render_print_card(circle_images, card_size, scale, card_cache, layout, seed,
+                                 icon_atlas, compositor)[1]
+
+    if icon_atlas is not None:
+        icon_cache.attach(icon_atlas)
+    if card_cache is not None:
+        key = card_cache.key(circle_images, card_size, scale, layout, seed)
+        data = card_cache.load(key, 'png')
+        if data is not None:
+            return data
+
+    if compositor == 'numpy':
+        card = ArrayCompositor(card_size, card_size).draw(
+            circle_images, 0, 0, card_size, scale, layout, seed, return_card=True)
+    else:
+        card = create_circle_with_images(circle_images, card_size, scale, layout, seed)
+
+    with stage('card_encode') as record:
+        buffer = io.BytesIO()
+        card.save(buffer, 'PNG')
+        record.bytes = buffer.tell()
+    if card_cache is not None:
+        card_cache.store(key, 'png', buffer.getvalue())
+    return buffer.getvalue()
+
+
+# Resolution at which the vector engine embeds icons, independent of their size on the page
+VECTOR_ICON_DPI = 300
+
+
+def circle_path(cx, cy, r):
+    """PDF path operators for a circle made of four Bezier curves"""
+    k = 0.5523 * r
+    return (f'{cx + r:.2f} {cy:.2f} m '
+            f'{cx + r:.2f} {cy + k:.2f} {cx + k:.2f} {cy + r:.2f} {cx:.2f} {cy + r:.2f} c '
+            f'{cx - k:.2f} {cy + r:.2f} {cx - r:.2f} {cy + k:.2f} {cx - r:.2f} {cy:.2f} c '
+            f'{cx - r:.2f} {cy - k:.2f} {cx - k:.2f} {cy - r:.2f} {cx:.2f} {cy - r:.2f} c '
+            f'{cx + k:.2f} {cy - r:.2f} {cx + r:.2f} {cy - k:.2f} {cx + r:.2f} {cy:.2f} c ')
+
+
+class VectorPageRenderer:
+    """Draws pages as vector paths that reference every distinct icon only once"""
+
+    def __init__(self, writer, imposition, icon_dpi=VECTOR_ICON_DPI, layout='ring', seed=0):
+        self.writer = writer
+        self.imposition = imposition
+        self.icon_dpi = icon_dpi
+        self.layout = layout
+        self.seed = seed
+        # image path -> (resource name, object id, source size)
+        self.icons = {}
+
+    def icon(self, image_path, embed_size):
+        icon = self.icons.get(image_path)
+        if icon is None:
+            with Image.open(image_path) as source:
+                source_size = source.size
+            image_id = self.writer.add_image(icon_cache.get(image_path, embed_size))
+            icon = (f'I{image_id}', image_id, source_size)
+            self.icons[image_path] = icon
+        return icon
+
+    def render_page(self, page_image_groups):
+        ops = []
+        xobjects = {}
+        d = self.imposition.circle_diameter
+        geometry = None
+        for index, circle_images in enumerate(page_image_groups):
+            left, bottom = self.imposition.origin(index)
+            cx, cy = left + d / 2, bottom + d / 2
+            if geometry is None or geometry.num_symbols != len(circle_images):
+                geometry = card_layout(d, len(circle_images), self.layout)
+                # Every icon is embedded once, big enough for the largest slot
+                embed_size = round(geometry.max_slot_size * self.icon_dpi / 72)
+            if geometry.randomized:
+                slots = place_randomly(circle_images, d, self.seed)
+            else:
+                slots = geometry.slots
+
+            # Clip the icons to the card, then draw the cut line on top
+            ops.append('q ' + circle_path(cx, cy, d / 2) + 'W n')
+            for image_path, slot in zip(circle_images, slots):
+                name, image_id, (source_width, source_height) = self.icon(image_path, embed_size)
+                xobjects[name] = image_id
+                # Same size Image.thumbnail gives the raster engine
+                scale = min(1, slot[2] / max(source_width, source_height))
+                width = max(1, round(source_width * scale))
+                height = max(1, round(source_height * scale))
+                if geometry.randomized:
+                    # Scale the unit square, rotate it about its center and move it into place
+                    center_x, center_y, _, angle = slot
+                    cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+                    a, b, c, e = width * cos, width * sin, -height * sin, height * cos
+                    x = left + center_x - (a + c) / 2
+                    y = bottom + d - center_y - (b + e) / 2
+                    matrix = f'{a:.4f} {b:.4f} {c:.4f} {e:.4f} {x:.4f} {y:.4f}'
+                else:
+                    x, y, size = slot
+                    if geometry.centered:
+                        x += (size - width) / 2
+                        y += (size - height) / 2
+                    matrix = f'{width} 0 0 {height} {left + x:.2f} {bottom + d - y - height:.2f}'
+                ops.append(f'q {matrix} cm /{name} Do Q')
+            ops.append('Q')
+            ops.append('0.5 w 0 G ' + circle_path(cx, cy, d / 2) + 'S')
+
+        self.writer.add_content_page(self.imposition.page_width, self.imposition.page_height,
+                                     '\n'.join(ops).encode(), xobjects)
+
+
+# JPEG quality of cards rendered for print with create_pdf(dpi=...)
+PRINT_JPEG_QUALITY = 90
+
+
+def write_print_pages(deck, output_pdf, dpi, workers, imposition, card_cache=None,
+                      tracker=None, layout='ring', seed=0, icon_atlas=None, compositor='pillow'):
+    """Render every card at the given dpi on its own buffer and place it on the page
+
+    No page-sized bitmap is ever allocated, memory is bounded by one card per worker.
+    """
+    scale = dpi / 72
+    circle_diameter = imposition.circle_diameter
+    card_size = round(circle_diameter * scale)
+    render = functools.partial(render_print_card, card_size=card_size, scale=scale,
+                               card_cache=card_cache, layout=layout, seed=seed,
+                               icon_atlas=icon_atlas, compositor=compositor)
+
+    with PdfWriter(output_pdf) as writer:
+        ops = []
+        xobjects = {}
+        cards = iter_rendered(deck, render, min(workers or 1, len(deck)))
+        for index, (size, data) in enumerate(cards):
+            image_id = writer.add_jpeg(size, data)
+            del data
+            name = f'C{image_id}'
+            xobjects[name] = image_id
+            left, bottom = imposition.origin(index % imposition.cards_per_page)
+            clip = ''
+            if imposition.packing == 'hex':
+                # Staggered cards overlap each other's square, the JPEG's white corners
+                # must not cover a neighbour
+                radius = circle_diameter / 2
+                clip = circle_path(left + radius, bottom + radius,
+                                   radius + imposition.bleed) + 'W n '
+            ops.append(f'q {clip}{circle_diameter} 0 0 {circle_diameter} {left:.2f} {bottom:.2f} '
+                       f'cm /{name} Do Q')
+
+            page_done = len(ops) == imposition.cards_per_page or index == len(deck) - 1
+            if page_done:
+                writer.add_content_page(imposition.page_width, imposition.page_height,
+                                        '\n'.join(ops).encode(), xobjects)
+                ops = []
+                xobjects = {}
+            if tracker is not None:
+                tracker.advance(1, int(page_done))
+
+
+class BuildCancelled(Exception):
+    """Raised inside a build once its cancel event is set"""
+
+
+class BuildProgress:
+    """Counts the cards and pages written, reports them and stops cancelled builds
+
+    progress is called as progress(cards, total_cards, pages, total_pages) and
+    cancel is anything with is_set(), usually a threading.Event.
+    """
+
+    def __init__(self, num_cards, num_pages, progress=None, cancel=None):
+        self.num_cards = num_cards
+        self.num_pages = num_pages
+        self.cards = 0
+        self.pages = 0
+        self.progress = progress
+        self.cancel = cancel
+
+    def check(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise BuildCancelled("PDF build cancelled")
+
+    def advance(self, cards=0, pages=0):
+        self.cards += cards
+        self.pages += pages
+        if self.progress is not None:
+            self.progress(self.cards, self.num_cards, self.pages, self.num_pages)
+        self.check()
+
+
+def atlas_icon_sizes(circle_diameter, num_symbols, layout='ring', engine='raster', dpi=None):
+    """Every icon size a build with these settings asks the icon cache for"""
+    geometry = card_layout(circle_diameter, num_symbols, layout)
+    # Random placement tries its sizes at 72 dpi, whatever the engine and resolution
+    placement = set()
+    if geometry.randomized:
+        placement = {max(1, round(geometry.max_slot_size * factor)) for factor in RANDOM_SIZES}
+        # Crowded cards fall back to the grid
+        placement |= {size for _, _, size in
+                      card_layout(circle_diameter, num_symbols, 'grid').slots}
+
+    if engine == 'vector':
+        return sorted(placement | {round(geometry.max_slot_size * (dpi or VECTOR_ICON_DPI) / 72)})
+    if not dpi:
+        return sorted(placement | {size for _, _, size in geometry.slots})
+    # Same float as the renderers, so halves round the same way
+    scale = dpi / 72
+    if geometry.randomized:
+        return sorted(placement | {round(size * scale) for size in placement})
+    print_layout = card_layout(round(circle_diameter * scale), num_symbols, layout, scale)
+    return sorted({size for _, _, size in print_layout.slots})
+
+
+def check_card_options(layout, compositor):
+    if layout not in LAYOUT_STYLES:
+        raise ValueError(f"Unknown card layout: {layout}")
+    if compositor not in COMPOSITORS:
+        raise ValueError(f"Unknown compositor: {compositor}")
+    if compositor == 'numpy' and import_numpy() is None:
+        raise ValueError("The numpy compositor needs NumPy, install it with pip install numpy")
+
+
+def load_deck(image_folder, order=None):
+    # Sorted so the same folder always maps symbols to the same images
+    image_files = sorted(os.path.join(image_folder, f) for f in os.listdir(
+        image_folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return Deck(image_files, order)
+
+
+def create_pdf(image_folder, output_pdf, workers=1, order=None, deck=None, engine='raster',
+               dpi=None, card_cache=None, progress=None, cancel=None, layout='ring', seed=0,
+               icon_atlas=None, compositor='pillow', paper='a4', card_diameter=CARD_DIAMETER,
+               bleed=CARD_BLEED, packing=None):
+    """Write a deck's cards to a PDF, as many to a sheet as the imposition fits
+
+    packing is 'square' or 'hex', None picks whichever fits more cards.
+    """
+    if engine not in ('raster', 'vector'):
+        raise ValueError(f"Unknown PDF engine: {engine}")
+    check_card_options(layout, compositor)
+    imposition = impose(paper, card_diameter, bleed, packing)
+    circle_diameter = imposition.circle_diameter
+    cards_per_page = imposition.cards_per_page
+
+    if deck is None:
+        deck = load_deck(image_folder, order)
+
+    # Cards are pulled from the deck one page at a time
+    cards = iter(deck)
+    page_slices = iter(lambda: list(itertools.islice(cards, cards_per_page)), [])
+    num_pages = -(-len(deck) // cards_per_page)
+    tracker = BuildProgress(len(deck), num_pages, progress, cancel)
+    tracker.check()
+    render = functools.partial(
+        render_page, imposition=imposition, card_cache=card_cache, layout=layout, seed=seed,
+        icon_atlas=icon_atlas, compositor=compositor)
+    if card_cache is not None and engine == 'raster':
+        card_cache.warm(deck.symbols)
+    if icon_atlas is not None:
+        icon_atlas.ensure(deck.symbols, atlas_icon_sizes(
+            circle_diameter, deck.order + 1, layout, engine, dpi))
+        icon_cache.attach(icon_atlas)
+
+    if engine == 'vector':
+        with PdfWriter(output_pdf) as writer:
+            renderer = VectorPageRenderer(writer, imposition, icon_dpi=dpi or VECTOR_ICON_DPI,
+                                          layout=layout, seed=seed)
+            for page_image_groups in page_slices:
+                renderer.render_page(page_image_groups)
+                tracker.advance(len(page_image_groups), 1)
+        return
+
+    if dpi:
+        write_print_pages(deck, output_pdf, dpi, workers, imposition, card_cache, tracker,
+                          layout, seed, icon_atlas, compositor)
+        return
+
+    # Each page is written as soon as it is rendered and then dropped
+    with PdfWriter(output_pdf) as writer:
+        for page in iter_rendered(page_slices, render, min(workers or 1, num_pages)):
+            writer.add_page(page)
+            del page
+            tracker.advance(min(cards_per_page, len(deck) - tracker.cards), 1)
+
+
+def build_game_pdf(game, workers=1, engine='raster', dpi=None, sinks=(), progress=None,
+                   cancel=None, layout='ring', seed=0, compositor='pillow', paper='a4',
+                   card_diameter=CARD_DIAMETER, bleed=CARD_BLEED, packing=None,
+                   max_order=DECK_ORDER):
+    """Validate a game's deck and write its PDF, shared by the GUI and the CLI
+
+    The stage breakdown always goes to build_summaries, sinks get it as well.
+    progress and cancel are passed on to create_pdf, see BuildProgress.
+    """
+    with BuildStats(game.id, [build_summaries, *sinks]):
+        deck, report = game_deck(game, max_order)
+        create_pdf(game.image_folder(), game.pdf_file(), workers=workers, deck=deck,
+                   engine=engine, dpi=dpi, card_cache=card_cache, progress=progress,
+                   cancel=cancel, layout=layout, seed=seed, icon_atlas=game_icon_atlas(game),
+                   compositor=compositor, paper=paper, card_diameter=card_diameter,
+                   bleed=bleed, packing=packing)
+    return report
+
+
+def game_deck(game, max_order=DECK_ORDER):
+    """A game's deck and its validation report, invalid decks raise ValueError"""
+    # The images table is the catalog, no directory scan needed
+    deck = Deck(db.list_images(game.id), max_order=max_order)
+
+    # Never print a deck that breaks the one-shared-symbol rule
+    with stage('validate'):
+        report = deck.validate()
+    if not report.is_valid:
+        raise ValueError(f"Invalid deck: {report.summary()}")
+    return deck, report
+
+
+def game_icon_atlas(game):
+    return icon_atlas(os.path.join('cache', 'atlas', f'{game.id}.atlas'))
+
+
+# Resolution of exported cards, print shops expect 300 dpi
+EXPORT_DPI = 300
+EXPORT_FORMATS = ('png', 'jpeg')
+
+
+def export_cards(deck, output_zip, image_format='png', dpi=EXPORT_DPI, workers=1,
+                 card_cache=None, progress=None, cancel=None, layout='ring', seed=0,
+                 icon_atlas=None, compositor='pillow', card_diameter=CARD_DIAMETER):
+    """Write every card of a deck as its own PNG or JPEG file into a ZIP archive
+
+    Cards are encoded in worker processes and each file goes into the archive
+    as soon as it is its turn, so neither the deck nor the archive is ever held
+    in memory and nothing is staged on disk. Like PdfWriter, the archive only
+    replaces output_zip once it is complete.
+    """
+    if image_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {image_format}")
+    check_card_options(layout, compositor)
+
+    scale = dpi / 72
+    card_size = round(card_diameter * scale)
+    tracker = BuildProgress(len(deck), 0, progress, cancel)
+    tracker.check()
+    if icon_atlas is not None:
+        icon_atlas.ensure(deck.symbols, atlas_icon_sizes(
+            card_diameter, deck.order + 1, layout, 'raster', dpi))
+        icon_cache.attach(icon_atlas)
+    render = functools.partial(render_card_file, card_size=card_size, scale=scale,
+                               image_format=image_format, card_cache=card_cache, layout=layout,
+                               seed=seed, icon_atlas=icon_atlas, compositor=compositor)
+
+    extension = 'jpg' if image_format == 'jpeg' else 'png'
+    temp_path = f"{output_zip}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        # Stored, PNG and JPEG don't compress any further
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as archive:
+            cards = iter_rendered(deck, render, min(workers or 1, len(deck)))
+            for index, data in enumerate(cards, 1):
+                # A fixed timestamp keeps the archive reproducible
+                info = zipfile.ZipInfo(f'card-{index:03}.{extension}', (1980, 1, 1, 0, 0, 0))
+                with stage('zip_write', len(data)):
+                    archive.writestr(info, data)
+                del data
+                tracker.advance(1)
+        os.replace(temp_path, output_zip)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def export_game_cards(game, image_format='png', dpi=None, workers=1, sinks=(), progress=None,
+                      cancel=None, layout='ring', seed=0, compositor='pillow',
+                      card_diameter=CARD_DIAMETER, max_order=DECK_ORDER):
+    """Validate a game's deck and export its cards, see export_cards"""
+    with BuildStats(game.id, [build_summaries, *sinks]):
+        deck, report = game_deck(game, max_order)
+        export_cards(deck, game.cards_file(), image_format, dpi or EXPORT_DPI, workers,
+                     card_cache, progress, cancel, layout, seed, game_icon_atlas(game),
+                     compositor, card_diameter)
+    return report
+
+
+class BlobStore:
+    """Content-addressed image files shared by every game, named by their SHA-256"""
+
+    def __init__(self, root=os.path.join('images', 'blobs')):
+        self.root = root
+
+    def path(self, content_hash, extension):
+        return os.path.join(self.root, content_hash[:2], f"{content_hash}{extension.lower()}")
+
+    def contains(self, path):
+        return os.path.abspath(path).startswith(os.path.abspath(self.root) + os.sep)
+
+    def put(self, data, extension):
+        """Store bytes and return their blob path, storing the same content twice is a no-op"""
+        path = self.path(hashlib.sha256(data).hexdigest(), extension)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return path
+
+    def add_file(self, file_path):
+        """Copy an existing file into the store and return its blob path"""
+        with open(file_path, 'rb') as f:
+            return self.put(f.read(), os.path.splitext(file_path)[1])
+
+
+blob_store = BlobStore()
+
+
+class Database:
+    """Shared data-access layer, one long-lived WAL connection per process"""
+
+    # Statements are constants so sqlite3's statement cache keeps them prepared
+    INSERT_GAME = 'INSERT INTO games (name, difficulty) VALUES (?, ?)'
+    SELECT_GAME = 'SELECT id, name, difficulty FROM games WHERE id = ?'
+    SELECT_GAMES = 'SELECT id, name, difficulty FROM games ORDER BY id'
+    SELECT_GAMES_BY_DIFFICULTY = ('SELECT id, name, difficulty FROM games '
+                                  'WHERE difficulty = ? ORDER BY id')
+    SELECT_IMAGES = 'SELECT image_path FROM images WHERE game_id = ? ORDER BY image_path'
+    COUNT_IMAGES = 'SELECT COUNT(*) FROM images WHERE game_id = ?'
+    INSERT_IMAGE = 'INSERT OR IGNORE INTO images (game_id, image_path) VALUES (?, ?)'
+    DELETE_IMAGE = 'DELETE FROM images WHERE game_id = ? AND image_path = ?'
+    COUNT_REFERENCES = 'SELECT COUNT(*) FROM images WHERE image_path = ?'
+    SELECT_IMAGE_RECORDS = ('''
+        SELECT image_path, COALESCE(original_name, image_path) FROM images
+        WHERE game_id = ? ORDER BY image_path
+    ''')
+    UPSERT_IMAGE = ('''
+        INSERT INTO images (game_id, image_path, width, height, original_name)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (game_id, image_path) DO UPDATE SET
+            width = excluded.width, height = excluded.height,
+            original_name = excluded.original_name, uploaded_at = CURRENT_TIMESTAMP
+    ''')
+
+    def __init__(self, path='games.db'):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        # A connection must not cross a fork, worker processes open their own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False,
+                                         cached_statements=64)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def initialize(self):
+        """Create the tables and indexes, and catalog images added before the index existed"""
+        moved = []
+        with self._lock, self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS games (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    difficulty TEXT
+                );
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS images (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    game_id INT NOT NULL,
+                    image_path TEXT NOT NULL,
+                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (game_id) REFERENCES games(id)
+                );
+            ''')
+            # Leading game_id column also serves every per-game lookup
+            self.conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_images_game_path
+                ON images (game_id, image_path);
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_games_difficulty ON games (difficulty);')
+
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1:
+                self._catalog_existing_images()
+                self.conn.execute('PRAGMA user_version = 1')
+            if version < 2:
+                # Metadata of normalized images, NULL for files from before ingest
+                for column in ('width INT', 'height INT', 'original_name TEXT'):
+                    self.conn.execute(f'ALTER TABLE images ADD COLUMN {column}')
+                self.conn.execute('PRAGMA user_version = 2')
+            if version < 3:
+                moved = self._move_images_to_blob_store()
+                self.conn.execute('PRAGMA user_version = 3')
+            # Reference counts of shared blobs are looked up by path
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_images_path ON images (image_path);')
+
+        # Only once the catalog points at the blobs, a failed move keeps every original
+        for image_path in moved:
+            if os.path.exists(image_path):
+                os.remove(image_path)
+
+    def _catalog_existing_images(self):
+        """One-off scan of images/<game_id> for libraries created before the catalog"""
+        for (game_id,) in self.conn.execute('SELECT id FROM games').fetchall():
+            folder = Game(game_id, '', '').image_folder()
+            if not os.path.isdir(folder):
+                continue
+            self.conn.executemany(self.INSERT_IMAGE, [
+                (game_id, os.path.join(folder, f)) for f in os.listdir(folder)
+                if f.lower().endswith(IMAGE_EXTENSIONS)])
+
+    def _move_images_to_blob_store(self):
+        """One-off copy of per-game images into the shared blob store
+
+        Returns the originals, they are deleted by the caller once the
+        transaction has committed.
+        """
+        moved = []
+        rows = self.conn.execute('SELECT id, game_id, image_path, original_name FROM images')
+        for row_id, game_id, image_path, original_name in rows.fetchall():
+            if blob_store.contains(image_path) or not os.path.isfile(image_path):
+                continue
+            blob_path = blob_store.add_file(image_path)
+            moved.append(image_path)
+            original_name = original_name or os.path.basename(image_path)
+            duplicate = self.conn.execute(
+                'SELECT 1 FROM images WHERE game_id = ? AND image_path = ?',
+                (game_id, blob_path)).fetchone()
+            if duplicate:
+                # The game already had a copy with the same content
+                self.conn.execute('DELETE FROM images WHERE id = ?', (row_id,))
+            else:
+                self.conn.execute(
+                    'UPDATE images SET image_path = ?, original_name = ? WHERE id = ?',
+                    (blob_path, original_name, row_id))
+        return moved
+
+    def add_game(self, name, difficulty):
+        with self._lock, self.conn:
+            return self.conn.execute(self.INSERT_GAME, (name, difficulty)).lastrowid
+
+    def get_game(self, game_id):
+        with self._lock:
+            row = self.conn.execute(self.SELECT_GAME, (game_id,)).fetchone()
+        return Game(*row) if row else None
+
+    def get_games(self, game_ids=None, difficulty=None):
+        """Games, optionally filtered by id and difficulty"""
+        with self._lock:
+            if difficulty:
+                rows = self.conn.execute(self.SELECT_GAMES_BY_DIFFICULTY, (difficulty,)).fetchall()
+            else:
+                rows = self.conn.execute(self.SELECT_GAMES).fetchall()
+        games = [Game(*row) for row in rows]
+        if game_ids:
+            game_ids = set(game_ids)
+            games = [game for game in games if game.id in game_ids]
+        return games
+
+    def list_images(self, game_id):
+        """Paths of a game's images, sorted so decks map symbols the same way every time"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(self.SELECT_IMAGES, (game_id,))]
+
+    def list_image_records(self, game_id):
+        """(image path, display name) of a game's images"""
+        with self._lock:
+            return self.conn.execute(self.SELECT_IMAGE_RECORDS, (game_id,)).fetchall()
+
+    def count_images(self, game_id):
+        with self._lock:
+            return self.conn.execute(self.COUNT_IMAGES, (game_id,)).fetchone()[0]
+
+    def add_images(self, game_id, image_paths):
+        with self._lock, self.conn:
+            self.conn.executemany(self.INSERT_IMAGE,
+                                  [(game_id, image_path) for image_path in image_paths])
+
+    def add_ingested_images(self, game_id, records):
+        """Catalog normalized images together with their metadata"""
+        with self._lock, self.conn:
+            self.conn.executemany(self.UPSERT_IMAGE, [
+                (game_id, record['image_path'], record['width'], record['height'],
+                 record['original_name']) for record in records])
+
+    def remove_image(self, game_id, image_path):
+        """Drop a game's reference to an image, returns how many references remain"""
+        with self._lock, self.conn:
+            self.conn.execute(self.DELETE_IMAGE, (game_id, image_path))
+            return self.conn.execute(self.COUNT_REFERENCES, (image_path,)).fetchone()[0]
+
+
+db = Database()
+
+
+def initialize_database():
+    """Initialize the database with required tables"""
+    db.initialize()
+
+
+def get_games(game_ids=None, difficulty=None):
+    return db.get_games(game_ids, difficulty)
+
+
+# Longest side of normalized images, enough for icons printed at well over 600 dpi
+INGEST_MAX_SIZE = 1024
+# Threads are enough here, Pillow releases the GIL while decoding, resizing and encoding
+INGEST_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def normalize_image(source_path):
+    """Decode, validate and store a downscaled RGBA PNG blob, runs in a worker thread"""
+    with Image.open(source_path) as source:
+        source.load()
+        # Phone photos are often stored sideways with an EXIF rotation
+        image = ImageOps.exif_transpose(source)
+    if image.width == 0 or image.height == 0:
+        raise ValueError("Image has zero dimensions")
+
+    image = image.convert('RGBA')
+    image.thumbnail((INGEST_MAX_SIZE, INGEST_MAX_SIZE), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return {
+        'image_path': blob_store.put(buffer.getvalue(), '.png'),
+        'width': image.width,
+        'height': image.height,
+        'original_name': os.path.basename(source_path),
+    }
+
+
+def ingest_images(game, source_paths, workers=INGEST_WORKERS, progress=None):
+    """Normalize images into the blob store in parallel and add them to a game
+
+    progress(done, total) is called after every file, returns the stored
+    records and a list of (source path, error message) for rejected files.
+    Identical images share one blob, within a game and across games.
+    """
+    records = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(normalize_image, source_path): source_path
+                   for source_path in source_paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                records.append(future.result())
+            except Exception as e:
+                errors.append((futures[future], str(e)))
+            if progress:
+                progress(done, len(futures))
+
+    db.add_ingested_images(game.id, records)
+    return records, errors
+
+
+def remove_game_image(game, image_path):
+    """Drop a game's reference to an image, the file goes once nothing references it"""
+    if db.remove_image(game.id, image_path) == 0 and os.path.exists(image_path):
+        os.remove(image_path)
+        return True
+    return False
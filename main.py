@@ -1,66 +1,21 @@
 import os
-import math
-import shutil
-import sqlite3
+import queue
+import bisect
+import threading
 import webbrowser
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import messagebox, filedialog
-from PIL import Image, ImageTk, ImageDraw
+from PIL import ImageTk
 
-
-class Game:
-    def __init__(self, id, name, difficulty):
-        self.id = id
-        self.name = name
-        self.difficulty = difficulty
-
-    def pdf_file(self):
-        base_path = 'documents'
-        # folder should exist
-        os.makedirs(base_path, exist_ok=True)
-        filename = f"{self.name.replace(' ', '-').lower()}.pdf"
-        path = os.path.join(base_path, filename)
-        return path
-
-    def pdf_file_exists(self):
-        return os.path.isfile(self.pdf_file())
-
-
-def resize_image(filename, new_width):
-    try:
-        print(f"Opening image: {filename}")
-        original_image = Image.open(filename)
-        
-        # Convert to RGB if necessary (for PNG with transparency)
-        if original_image.mode in ('RGBA', 'LA', 'P'):
-            # Create a white background
-            background = Image.new('RGB', original_image.size, (255, 255, 255))
-            if original_image.mode == 'P':
-                original_image = original_image.convert('RGBA')
-            background.paste(original_image, mask=original_image.split()[-1] if original_image.mode == 'RGBA' else None)
-            original_image = background
-        elif original_image.mode != 'RGB':
-            original_image = original_image.convert('RGB')
-        
-        original_width, original_height = original_image.size
-        
-        # Calculate new dimensions maintaining aspect ratio
-        if original_width > original_height:
-            # Landscape image - fit to width
-            new_height = int((new_width / original_width) * original_height)
-        else:
-            # Portrait or square image - fit to height
-            new_height = new_width
-            new_width = int((new_height / original_height) * original_width)
-        
-        resized_image = original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        print(f"Resized image from {original_width}x{original_height} to {new_width}x{new_height}")
-        return resized_image
-    except Exception as e:
-        print(f"Error in resize_image: {str(e)}")
-        # Return a placeholder image if loading fails
-        placeholder = Image.new('RGB', (new_width, new_width), color='lightgray')
-        return placeholder
+# The rendering core lives in engine.py so it can be used without Tk,
+# its public names are re-exported here for existing imports
+from engine import (Game, resize_image, create_circular_mask, thumbnail_cache, db,
+                    create_pdf, build_game_pdf, ingest_images, remove_game_image,
+                    initialize_database, build_summaries, format_stats, BuildCancelled,
+                    PDF_RENDER_WORKERS, DECK_ORDER, deck_order_for)
 
 
 def add_game():
@@ -73,14 +28,7 @@ def add_game():
             return
 
         # Insert the game into the database
-        conn = sqlite3.connect('games.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO games (name, difficulty) VALUES (?, ?)
-        ''', (name, difficulty,))
-
-        conn.commit()
-        conn.close()
+        db.add_game(name, difficulty)
 
         messagebox.showinfo("Success", "Game added successfully!")
         entry_name.delete(0, tk.END)
@@ -95,18 +43,14 @@ def add_game():
 # Function to load games from the database
 def load_games():
     try:
-        conn = sqlite3.connect('games.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM games')
-        games = cursor.fetchall()
-        conn.close()
+        games = db.get_games()
 
         # Clear the listbox
         game_listbox.delete(0, tk.END)
 
         # Populate the listbox with game names
         for game in games:
-            game_listbox.insert(tk.END, f"{game[0]}: {game[1]}")
+            game_listbox.insert(tk.END, f"{game.id}: {game.name}")
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
@@ -117,14 +61,10 @@ def select_game(event):
         selected_game = game_listbox.get(game_listbox.curselection())
         game_id = selected_game.split(":")[0]
 
-        conn = sqlite3.connect('games.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM games WHERE id = ?', (game_id,))
-        game = cursor.fetchone()
-        conn.close()
+        game = db.get_game(game_id)
 
         # Navigate to the game detail page
-        show_game_detail(Game(game[0], game[1], game[2]))
+        show_game_detail(game)
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
@@ -132,10 +72,13 @@ def select_game(event):
 def show_game_detail(game):
     for widget in root.winfo_children():
         widget.destroy()
-    
-    # Global variable to store image references (prevent garbage collection)
-    global game_image_references
-    game_image_references = []
+
+    # The gallery keeps its own bounded PhotoImage references
+    global current_gallery, current_game_id, pdf_status_label
+    global image_count_label, gallery_title_label
+    current_gallery = None
+    current_game_id = game.id
+    pdf_status_label = None
 
     # Main container
     main_container = tk.Frame(root, bg="#f5f5f5")
@@ -189,11 +132,23 @@ def show_game_detail(game):
                               relief=tk.FLAT, padx=20, pady=10, width=15)
     add_photos_btn.pack(fill=tk.X, pady=(0, 10))
 
-    generate_pdf_btn = tk.Button(actions_content, text="📄 Generate PDF", 
-                                command=lambda: generate_pdf(game),
-                                font=("Arial", 12, "bold"), bg="#f39c12", fg="#d68910",
-                                relief=tk.FLAT, padx=20, pady=10, width=15)
-    generate_pdf_btn.pack(fill=tk.X, pady=(0, 10))
+    job = pdf_jobs.get(game.id)
+    if job is None:
+        generate_pdf_btn = tk.Button(actions_content, text="📄 Generate PDF", 
+                                    command=lambda: generate_pdf(game),
+                                    font=("Arial", 12, "bold"), bg="#f39c12", fg="#d68910",
+                                    relief=tk.FLAT, padx=20, pady=10, width=15)
+        generate_pdf_btn.pack(fill=tk.X, pady=(0, 10))
+    else:
+        # The build runs in the background, its progress replaces the button
+        job_frame = tk.Frame(actions_content, bg="white")
+        job_frame.pack(fill=tk.X, pady=(0, 10))
+        pdf_status_label = tk.Label(job_frame, text=job.status_text(), font=("Arial", 10),
+                                    bg="white", fg="black", anchor=tk.W)
+        pdf_status_label.pack(fill=tk.X)
+        tk.Button(job_frame, text="✖ Cancel", command=job.cancel,
+                  font=("Arial", 12, "bold"), bg="#e74c3c", fg="#c0392b",
+                  relief=tk.FLAT, padx=20, pady=5).pack(fill=tk.X, pady=(5, 0))
 
     file = game.pdf_file()
     if os.path.isfile(file):
@@ -210,17 +165,22 @@ def show_game_detail(game):
     tk.Label(stats_frame, text="📊 Game Stats", font=("Arial", 12, "bold"), 
             bg="#f8f9fa", fg="black").pack(anchor=tk.W, padx=10, pady=(10, 5))
 
-    # Count images
-    subfolder_path = os.path.join('images', str(game.id))
-    os.makedirs(subfolder_path, exist_ok=True)
-    images = [f for f in os.listdir(subfolder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    # Count images, the images table is the catalog so no directory scan is needed
+    images = db.list_image_records(game.id)
     
-    tk.Label(stats_frame, text=f"Images: {len(images)}", font=("Arial", 10), 
-            bg="#f8f9fa", fg="black").pack(anchor=tk.W, padx=10, pady=2)
+    image_count_label = tk.Label(stats_frame, text=image_count_text(len(images)),
+                                 font=("Arial", 10), bg="#f8f9fa", fg="black")
+    image_count_label.pack(anchor=tk.W, padx=10, pady=2)
     
     tk.Label(stats_frame, text=f"PDF: {'✅ Generated' if os.path.isfile(file) else '❌ Not generated'}", 
             font=("Arial", 10), bg="#f8f9fa", fg="black").pack(anchor=tk.W, padx=10, pady=(2, 10))
 
+    # Where the time of the last build in this session went
+    summary = build_summaries.get(game.id)
+    if summary and not summary['error']:
+        tk.Label(stats_frame, text="\n".join(format_stats(summary)), font=("Arial", 9),
+                bg="#f8f9fa", fg="#555", justify=tk.LEFT).pack(anchor=tk.W, padx=10, pady=(0, 10))
+
     # Right section - Image Gallery
     gallery_frame = tk.Frame(content_frame, bg="white", relief=tk.RAISED, bd=2)
     gallery_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(10, 0))
@@ -230,95 +190,21 @@ def show_game_detail(game):
     gallery_header.pack(fill=tk.X)
     gallery_header.pack_propagate(False)
     
-    tk.Label(gallery_header, text=f"🖼️ Image Gallery ({len(images)} images)", 
-            font=("Arial", 14, "bold"), fg="white", bg="#e74c3c").pack(expand=True)
+    gallery_title_label = tk.Label(gallery_header, text=f"🖼️ Image Gallery ({len(images)} images)",
+                                   font=("Arial", 14, "bold"), fg="white", bg="#e74c3c")
+    gallery_title_label.pack(expand=True)
 
-    # Gallery content - simplified without scrollbar for testing
+    # Gallery content - virtualized canvas, only visible rows have widgets
     gallery_content = tk.Frame(gallery_frame, bg="white")
     gallery_content.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-    # Use a simple frame instead of canvas for now
-    scrollable_frame = tk.Frame(gallery_content, bg="white")
-    scrollable_frame.pack(fill=tk.BOTH, expand=True)
-
     # Display images in a grid
     if images:
         print(f"Loading {len(images)} images for gallery display")
-        
-        # Calculate grid layout
-        images_per_row = 3  # Reduced to make room for remove buttons
-        for i, image in enumerate(images):
-            try:
-                image_path = os.path.join(subfolder_path, image)
-                print(f"Loading image: {image_path}")  # Debug print
-                
-                # Check if file exists
-                if not os.path.exists(image_path):
-                    print(f"File does not exist: {image_path}")
-                    raise FileNotFoundError(f"Image file not found: {image_path}")
-                
-                # Load and resize image
-                resized_image = resize_image(image_path, 100)  # Larger thumbnails
-                print(f"Image resized successfully: {resized_image.size}")
-                
-                # Verify the image has content
-                if resized_image.size[0] == 0 or resized_image.size[1] == 0:
-                    raise ValueError("Resized image has zero dimensions")
-                
-                # Convert to PhotoImage
-                img = ImageTk.PhotoImage(image=resized_image)
-                game_image_references.append(img)  # Keep reference to prevent garbage collection
-                print(f"PhotoImage created successfully with size: {resized_image.size}")
-                
-                # Create image container
-                img_container = tk.Frame(scrollable_frame, bg="white", relief=tk.RAISED, bd=1)
-                img_container.grid(row=i // images_per_row, column=i % images_per_row, 
-                                 padx=5, pady=5, sticky="nsew")
-                
-                # Image label without size constraints to allow proper image display
-                img_label = tk.Label(img_container, image=img, bg="white")
-                img_label.pack(padx=5, pady=(5, 0))
-                print(f"Image label created and packed for: {image}")
-                
-                # Test if the image is actually set
-                if img_label.cget("image") == "":
-                    print(f"WARNING: Image not set on label for {image}")
-                else:
-                    print(f"SUCCESS: Image properly set on label for {image}")
-                
-                # Image name label with black text
-                name_label = tk.Label(img_container, text=image[:15] + "..." if len(image) > 15 else image,
-                                    font=("Arial", 9), bg="white", fg="black")
-                name_label.pack(pady=(2, 0))
-                
-                # Remove button
-                remove_btn = tk.Button(img_container, text="🗑️ Remove", 
-                                     command=lambda g=game, img=image: remove_image_from_game(g, img),
-                                     font=("Arial", 8, "bold"), bg="#e74c3c", fg="#c0392b",
-                                     relief=tk.FLAT, padx=8, pady=2)
-                remove_btn.pack(pady=(2, 5))
-                
-            except Exception as e:
-                print(f"Error loading image {image}: {str(e)}")  # Debug print
-                # Handle image loading errors
-                error_container = tk.Frame(scrollable_frame, bg="#ffebee", relief=tk.RAISED, bd=1)
-                error_container.grid(row=i // images_per_row, column=i % images_per_row, 
-                                   padx=5, pady=5, sticky="nsew")
-                
-                tk.Label(error_container, text="❌ Error", font=("Arial", 12, "bold"),
-                        bg="#ffebee", fg="#c62828").pack(expand=True)
-                tk.Label(error_container, text=f"Could not load:\n{image}", 
-                        font=("Arial", 8), bg="#ffebee", fg="#c62828").pack(pady=(0, 5))
-                
-                # Remove button for error images too
-                remove_btn = tk.Button(error_container, text="🗑️ Remove", 
-                                     command=lambda g=game, img=image: remove_image_from_game(g, img),
-                                     font=("Arial", 8, "bold"), bg="#e74c3c", fg="#c0392b",
-                                     relief=tk.FLAT, padx=8, pady=2)
-                remove_btn.pack(pady=(0, 5))
+        current_gallery = VirtualGallery(gallery_content, game, images)
     else:
         # No images message
-        no_images_frame = tk.Frame(scrollable_frame, bg="white")
+        no_images_frame = tk.Frame(gallery_content, bg="white")
         no_images_frame.pack(expand=True, pady=50)
         
         tk.Label(no_images_frame, text="📷 No Images Yet", font=("Arial", 16, "bold"),
@@ -326,12 +212,404 @@ def show_game_detail(game):
         tk.Label(no_images_frame, text="Click 'Add Photos' to get started!", 
                 font=("Arial", 12), bg="white", fg="black").pack(pady=10)
 
-    # No canvas needed for simple frame approach
     print("Gallery frame configured successfully")
 
 
+def image_count_text(count):
+    """Game Stats line of a game's images, with how many the deck leaves out"""
+    try:
+        order = deck_order_for(count, DECK_ORDER)
+    except ValueError:
+        return f"Images: {count}"
+    unused = count - (order * order + order + 1)
+    return f"Images: {count} ({unused} not used by the deck)" if unused else f"Images: {count}"
+
+
+def update_game_detail(game, added=(), removed=()):
+    """Apply added (image path, name) records and removed paths to the detail view
+
+    Only the affected tiles and the image counts change, the rest of the
+    view and every loaded thumbnail stay as they are.
+    """
+    gallery = current_gallery
+    if current_game_id != game.id or gallery is None or not gallery.canvas.winfo_exists():
+        # Nothing to patch, e.g. the "No Images Yet" placeholder is shown instead
+        show_game_detail(game)
+        return
+    gallery.insert_images(added)
+    for image_path in removed:
+        gallery.remove_image(image_path)
+    if not gallery.images:
+        show_game_detail(game)
+        return
+    count = len(gallery.images)
+    image_count_label.config(text=image_count_text(count))
+    gallery_title_label.config(text=f"🖼️ Image Gallery ({count} images)")
+
+
+# Background decoding of gallery thumbnails, results are applied on the Tk thread
+THUMBNAIL_WORKERS = min(8, os.cpu_count() or 1)
+THUMBNAIL_POLL_MS = 50
+thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+
+
+def load_thumbnail_job(image_path):
+    """Decode one thumbnail in a worker thread, never touches Tk"""
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image file not found: {image_path}")
+    thumbnail = thumbnail_cache.get(image_path, 100)
+    if thumbnail.size[0] == 0 or thumbnail.size[1] == 0:
+        raise ValueError("Resized image has zero dimensions")
+    return thumbnail
+
+
+class GalleryTile:
+    """Recyclable gallery tile, rebound to another image when scrolled out of view"""
+
+    def __init__(self, canvas):
+        self.index = None
+        self.image = None
+        self.photo = None
+        self.frame = tk.Frame(canvas, bg="white", relief=tk.RAISED, bd=1)
+        self.img_label = tk.Label(self.frame, bg="white", fg="black")
+        self.img_label.pack(padx=5, pady=(5, 0))
+
+        # Image name label with black text
+        self.name_label = tk.Label(self.frame, font=("Arial", 9), bg="white", fg="black")
+        self.name_label.pack(pady=(2, 0))
+
+        # Remove button
+        self.remove_btn = tk.Button(self.frame, text="🗑️ Remove",
+                                    font=("Arial", 8, "bold"), bg="#e74c3c", fg="#c0392b",
+                                    relief=tk.FLAT, padx=8, pady=2)
+        self.remove_btn.pack(pady=(2, 5))
+
+        self.window = canvas.create_window(0, 0, window=self.frame, anchor=tk.NW,
+                                           width=VirtualGallery.TILE_WIDTH - 10,
+                                           height=VirtualGallery.TILE_HEIGHT - 10)
+
+    def show_placeholder(self):
+        self.photo = None
+        self.set_colors("white", "black")
+        self.img_label.config(image="", text="⏳", font=("Arial", 24), width=4, height=2)
+
+    def show_thumbnail(self, photo):
+        # Held by the tile as well, so LRU eviction can't blank a visible tile
+        self.photo = photo
+        self.set_colors("white", "black")
+        self.img_label.config(image=photo, text="", width=0, height=0)
+
+    def show_error(self):
+        self.photo = None
+        self.set_colors("#ffebee", "#c62828")
+        self.img_label.config(image="", text="❌ Error", font=("Arial", 12, "bold"),
+                              width=0, height=0)
+
+    def set_colors(self, bg, fg):
+        for widget in (self.frame, self.img_label, self.name_label):
+            widget.config(bg=bg)
+        self.img_label.config(fg=fg)
+        self.name_label.config(fg=fg)
+
+
+class VirtualGallery:
+    """Scrollable image grid that only creates widgets for the rows in view"""
+
+    TILE_WIDTH = 140
+    TILE_HEIGHT = 175
+    # Rows rendered above and below the viewport to hide tile creation while scrolling
+    OVERSCAN_ROWS = 1
+
+    def __init__(self, parent, game, images):
+        self.game = game
+        # Images are shared blobs, tiles are keyed by path and labelled with the upload name
+        self.images = [image_path for image_path, _ in images]
+        self.names = dict(images)
+        self.columns = 1
+        self.visible = {}
+        self.free_tiles = []
+        self.errors = {}
+        # Only the PhotoImages of recently shown tiles are kept alive
+        self.photos = OrderedDict()
+        self.max_photos = 0
+        self.futures = {}
+        self.results = queue.Queue()
+        self.polling = False
+
+        self.canvas = tk.Canvas(parent, bg="white", highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.config(yscrollcommand=self.on_scroll)
+        self.canvas.bind('<Configure>', self.on_configure)
+        self.canvas.bind_all('<MouseWheel>', self.on_mousewheel)
+        self.canvas.bind_all('<Button-4>', self.on_mousewheel)
+        self.canvas.bind_all('<Button-5>', self.on_mousewheel)
+
+    def insert_images(self, records):
+        """Add (image path, name) records in catalog order, the tiles before them stay put"""
+        renamed = set()
+        for image, name in records:
+            if image not in self.names:
+                bisect.insort(self.images, image)
+            elif self.names[image] != name:
+                # Uploading an image again replaces its name
+                renamed.add(image)
+            self.names[image] = name
+        for index, tile in list(self.visible.items()):
+            if tile.image in renamed:
+                self.release_tile(index)
+        self.relayout()
+
+    def remove_image(self, image):
+        """Drop one image, only its tile and the ones after it are touched"""
+        index = bisect.bisect_left(self.images, image)
+        if index == len(self.images) or self.images[index] != image:
+            return
+        if index in self.visible:
+            self.release_tile(index)
+        del self.images[index]
+        del self.names[image]
+        self.photos.pop(image, None)
+        self.errors.pop(image, None)
+        self.relayout()
+
+    def relayout(self):
+        """Move the tiles in view to their images' new indexes and fill the gaps"""
+        visible = {}
+        for tile in self.visible.values():
+            tile.index = bisect.bisect_left(self.images, tile.image)
+            visible[tile.index] = tile
+            self.place_tile(tile)
+        self.visible = visible
+        self.update_scrollregion()
+        self.refresh()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def on_mousewheel(self, event):
+        if not self.canvas.winfo_exists():
+            return
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, tk.UNITS)
+        else:
+            self.canvas.yview_scroll(1, tk.UNITS)
+
+    def on_configure(self, event):
+        columns = max(1, event.width // self.TILE_WIDTH)
+        if columns != self.columns:
+            # Every tile moves when the column count changes, rebind them all
+            self.columns = columns
+            for index in list(self.visible):
+                self.release_tile(index)
+        self.update_scrollregion()
+        self.refresh()
+
+    def update_scrollregion(self):
+        rows = -(-len(self.images) // self.columns)
+        self.canvas.config(scrollregion=(0, 0, self.columns * self.TILE_WIDTH,
+                                         rows * self.TILE_HEIGHT),
+                           yscrollincrement=self.TILE_HEIGHT // 4)
+
+    def visible_range(self):
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        first_row = max(0, int(top // self.TILE_HEIGHT) - self.OVERSCAN_ROWS)
+        last_row = int((top + height) // self.TILE_HEIGHT) + self.OVERSCAN_ROWS
+        return range(first_row * self.columns,
+                     min(len(self.images), (last_row + 1) * self.columns))
+
+    def refresh(self):
+        """Bind tiles to the images in view and recycle the ones scrolled away"""
+        wanted = self.visible_range()
+        self.max_photos = max(self.max_photos, 2 * len(wanted))
+        for index in list(self.visible):
+            if index not in wanted:
+                self.release_tile(index)
+        for index in wanted:
+            if index not in self.visible:
+                self.bind_tile(index)
+
+    def release_tile(self, index):
+        tile = self.visible.pop(index)
+        self.canvas.itemconfigure(tile.window, state=tk.HIDDEN)
+        # Thumbnails that haven't started decoding yet are no longer needed
+        future = self.futures.get(tile.image)
+        if future is not None and future.cancel():
+            del self.futures[tile.image]
+        tile.index = tile.image = None
+        self.free_tiles.append(tile)
+
+    def bind_tile(self, index):
+        tile = self.free_tiles.pop() if self.free_tiles else GalleryTile(self.canvas)
+        image = self.images[index]
+        tile.index, tile.image = index, image
+        self.visible[index] = tile
+
+        self.place_tile(tile)
+        self.canvas.itemconfigure(tile.window, state=tk.NORMAL)
+        name = self.names[image]
+        tile.name_label.config(text=name[:15] + "..." if len(name) > 15 else name)
+        tile.remove_btn.config(
+            command=lambda g=self.game, img=image, n=name: remove_image_from_game(g, img, n))
+
+        if image in self.errors:
+            tile.show_error()
+        elif image in self.photos:
+            self.photos.move_to_end(image)
+            tile.show_thumbnail(self.photos[image])
+        else:
+            tile.show_placeholder()
+            self.request_thumbnail(image)
+
+    def place_tile(self, tile):
+        x = (tile.index % self.columns) * self.TILE_WIDTH + 5
+        y = (tile.index // self.columns) * self.TILE_HEIGHT + 5
+        self.canvas.coords(tile.window, x, y)
+
+    def request_thumbnail(self, image):
+        if image in self.futures:
+            return
+        future = thumbnail_executor.submit(
+            load_thumbnail_job, image)
+        future.add_done_callback(lambda f, img=image: self.results.put((img, f)))
+        self.futures[image] = future
+        if not self.polling:
+            self.polling = True
+            root.after(THUMBNAIL_POLL_MS, self.poll)
+
+    def poll(self):
+        """Apply finished thumbnails on the Tk thread"""
+        if not self.canvas.winfo_exists():
+            # The view has been destroyed, drop everything still queued
+            for future in self.futures.values():
+                future.cancel()
+            return
+
+        while True:
+            try:
+                image, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.futures.get(image) is future:
+                del self.futures[image]
+            if future.cancelled():
+                continue
+            self.apply_thumbnail(image, future)
+
+        if self.futures:
+            root.after(THUMBNAIL_POLL_MS, self.poll)
+        else:
+            self.polling = False
+            thumbnail_cache.flush()
+
+    def apply_thumbnail(self, image, future):
+        photo = None
+        try:
+            # Convert to PhotoImage
+            photo = ImageTk.PhotoImage(image=future.result())
+            self.photos[image] = photo
+            while len(self.photos) > self.max_photos:
+                self.photos.popitem(last=False)
+        except Exception as e:
+            print(f"Error loading image {image}: {str(e)}")  # Debug print
+            self.errors[image] = str(e)
+
+        for tile in self.visible.values():
+            if tile.image == image:
+                if photo is None:
+                    tile.show_error()
+                else:
+                    tile.show_thumbnail(photo)
+
+
+# PDF builds run one at a time on a background thread, each already uses every render worker
+PDF_POLL_MS = 100
+pdf_executor = ThreadPoolExecutor(max_workers=1)
+# Game id -> PdfJob of every queued or running build
+pdf_jobs = {}
+# Game shown in the detail view, its gallery and the label of its running build, if any
+current_game_id = None
+current_gallery = None
+pdf_status_label = None
+# Image counts of the detail view, updated in place when images are added or removed
+image_count_label = None
+gallery_title_label = None
+
+
+class PdfJob:
+    """One game's PDF build on the background thread, its progress is polled from Tk"""
+
+    def __init__(self, game):
+        self.game = game
+        self.cancel_event = threading.Event()
+        # (cards, total cards, pages, total pages), replaced by the build thread
+        self.progress = None
+        self.future = pdf_executor.submit(
+            build_game_pdf, game, workers=PDF_RENDER_WORKERS,
+            progress=self.on_progress, cancel=self.cancel_event)
+
+    def on_progress(self, *counts):
+        self.progress = counts
+
+    def cancel(self):
+        self.cancel_event.set()
+        # A build still queued behind another game's never starts
+        self.future.cancel()
+
+    def status_text(self):
+        if self.cancel_event.is_set():
+            return "Cancelling..."
+        if self.progress is None:
+            return "Starting..." if self.future.running() else "Waiting for another build..."
+        cards, total_cards, pages, total_pages = self.progress
+        return f"Page {pages}/{total_pages}, card {cards}/{total_cards}"
+
+
 def generate_pdf(game):
-    create_pdf(os.path.join('images', str(game.id)), game.pdf_file())
+    """Start building the game's PDF, the window stays responsive while it renders"""
+    if game.id in pdf_jobs:
+        return
+    pdf_jobs[game.id] = PdfJob(game)
+    if len(pdf_jobs) == 1:
+        root.after(PDF_POLL_MS, poll_pdf_jobs)
+    show_game_detail(game)
+
+
+def poll_pdf_jobs():
+    """Report finished builds and update the progress of the one on screen"""
+    for game_id, job in list(pdf_jobs.items()):
+        if job.future.done():
+            del pdf_jobs[game_id]
+            finish_pdf_job(job)
+
+    job = pdf_jobs.get(current_game_id)
+    if job is not None and pdf_status_label is not None and pdf_status_label.winfo_exists():
+        pdf_status_label.config(text=job.status_text())
+    if pdf_jobs:
+        root.after(PDF_POLL_MS, poll_pdf_jobs)
+
+
+def finish_pdf_job(job):
+    game = job.game
+    error = None if job.future.cancelled() else job.future.exception()
+    if isinstance(error, ValueError):
+        messagebox.showwarning("Cannot Generate PDF", f"{game.name}: {error}")
+    elif error is not None and not isinstance(error, BuildCancelled):
+        messagebox.showerror("Error", f"Could not generate the PDF for {game.name}: {error}")
+
+    # PDF status, build stats and the Generate button all change
+    if current_game_id == game.id:
+        show_game_detail(game)
+
+
+def on_close():
+    # Running builds stop at their next page instead of keeping the process alive
+    for job in pdf_jobs.values():
+        job.cancel()
+    root.destroy()
 
 
 def view_pdf(game):
@@ -367,92 +645,6 @@ def view_pdf(game):
         messagebox.showerror("Error", f"Could not open PDF: {str(e)}")
 
 
-def create_circular_mask(size):
-    mask = Image.new("L", size, 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0, 0) + size, fill=255, outline=(0,))
-    return mask
-
-
-def create_circle_with_images(image_paths, circle_diameter):
-    circle_image = Image.new(
-        "RGBA", (circle_diameter, circle_diameter), (255, 255, 255, 255))
-    mask = create_circular_mask((circle_diameter, circle_diameter))
-
-    num_images = len(image_paths)
-    angle_step = 360 / num_images
-    radius = circle_diameter // 2  # adjust radius for distance to center
-    radius = radius - 30
-
-    for i, image_path in enumerate(image_paths):
-        image = Image.open(image_path).convert("RGBA")
-        max_image_size = circle_diameter // 3  # Adjust this size if needed
-        image.thumbnail((max_image_size, max_image_size))
-
-        angle = i * angle_step
-        x = radius + int(radius * math.cos(math.radians(angle)))
-        y = radius + int(radius * math.sin(math.radians(angle)))
-        circle_image.paste(image, (x, y), image)
-
-    circle_image = Image.composite(circle_image, Image.new(
-        "RGBA", (circle_diameter, circle_diameter), (255, 255, 255, 0)), mask)
-    draw = ImageDraw.Draw(circle_image)
-
-    # todo: add outline to circle for easy cutting
-    # if possible dashed line
-    draw.ellipse((-5, -5, circle_diameter + 5, circle_diameter + 5), outline='black')
-
-    return circle_image
-
-
-def create_pdf(image_folder, output_pdf):
-    pdf_width, pdf_height = 595, 842  # A4 size in points (1 point = 1/72 inch)
-    padding = 15
-    # Adjust number of circles per row if needed
-    circle_diameter = (pdf_width - 3 * padding) // 3
-
-    image_files = [os.path.join(image_folder, f) for f in os.listdir(
-        image_folder) if f.endswith(('jpg', 'png', 'jpeg'))]
-
-    circles_per_row = int(pdf_width // (circle_diameter + padding))
-    rows_per_page = int(pdf_height // (circle_diameter + padding))
-    total_circles_per_page = circles_per_row * rows_per_page
-
-    # Group images into sets for each circle
-    num_images_per_circle = 5  # Adjust number of images per circle if needed
-    total_images_per_page = total_circles_per_page * num_images_per_circle
-
-    # Duplicate images if needed without exceeding the total number of images
-    while len(image_files) < total_images_per_page:
-        num_missing_images = total_images_per_page - len(image_files)
-        num_to_add = min(num_missing_images, len(image_files))
-        image_files += image_files[:num_to_add]
-
-    image_groups = [image_files[i:i + num_images_per_circle]
-                    for i in range(0, len(image_files), num_images_per_circle)]
-
-    pages = []
-    for i in range(0, len(image_groups), total_circles_per_page):
-        page = Image.new("RGB", (pdf_width, pdf_height), "white")
-        page_image_groups = image_groups[i:i + total_circles_per_page]
-
-        for row in range(rows_per_page):
-            for col in range(circles_per_row):
-                index = row * circles_per_row + col
-                if index < len(page_image_groups):
-                    circle_images = page_image_groups[index]
-                    circle_image = create_circle_with_images(
-                        circle_images, circle_diameter)
-                    circle_image
-                    x = padding + col * (circle_diameter + padding)
-                    y = padding + row * (circle_diameter + padding)
-                    page.paste(circle_image, (x, y), circle_image)
-        pages.append(page)
-
-    if pages:
-        pages[0].save(output_pdf, save_all=True, append_images=pages[1:])
-
-
 def add_images_to_game(game):
     # Prompt user to select images
     filetypes = [
@@ -468,31 +660,42 @@ def add_images_to_game(game):
         messagebox.showwarning("No Images Selected",
                                "Please select at least one image.")
         return
+    title = root.title()
+
+    def show_progress(done, total):
+        root.title(f"Importing images {done}/{total}...")
+        root.update_idletasks()
+
     try:
-        images_dir = 'images'
-        subfolder_path = os.path.join(images_dir, str(game.id))
-        os.makedirs(subfolder_path, exist_ok=True)
-        for file_path in image_files:
-            shutil.copy(file_path, subfolder_path)
-        messagebox.showinfo("Success", "Images added successfully!")
-        show_game_detail(game)
+        # Decoded, validated and downscaled once here instead of on every render
+        records, errors = ingest_images(game, image_files, progress=show_progress)
+        if errors:
+            failed = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in errors)
+            messagebox.showwarning("Some Images Skipped",
+                                   f"{len(records)} images added, these could not be read:\n{failed}")
+        else:
+            messagebox.showinfo("Success", "Images added successfully!")
+        update_game_detail(
+            game, added=[(record['image_path'], record['original_name']) for record in records])
     except Exception as e:
         messagebox.showerror("Error", str(e))
+    finally:
+        root.title(title)
 
 
-def remove_image_from_game(game, image_filename):
+def remove_image_from_game(game, image_path, name=None):
     """Remove a specific image from a game"""
+    name = name or os.path.basename(image_path)
     try:
-        subfolder_path = os.path.join('images', str(game.id))
-        image_path = os.path.join(subfolder_path, image_filename)
-        
-        if os.path.exists(image_path):
-            os.remove(image_path)
-            messagebox.showinfo("Success", f"Image '{image_filename}' removed successfully!")
-            # Refresh the game detail view
-            show_game_detail(game)
+        # Only the game's reference goes, other games may share the same file
+        exists = os.path.exists(image_path)
+        remove_game_image(game, image_path)
+        # The reference is gone either way, only the removed tile and the ones after it change
+        update_game_detail(game, removed=[image_path])
+        if exists:
+            messagebox.showinfo("Success", f"Image '{name}' removed successfully!")
         else:
-            messagebox.showerror("Error", f"Image file not found: {image_filename}")
+            messagebox.showerror("Error", f"Image file not found: {name}")
     except Exception as e:
         messagebox.showerror("Error", f"Could not remove image: {str(e)}")
 
@@ -502,6 +705,9 @@ def show_dashboard():
     for widget in root.winfo_children():
         widget.destroy()
 
+    global current_game_id
+    current_game_id = None
+
     # Main container with padding
     main_container = tk.Frame(root, bg="#f5f5f5")
     main_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -606,30 +812,6 @@ def show_dashboard():
             bg="#f8f9fa", fg="black", justify=tk.LEFT).pack(anchor=tk.W, padx=10, pady=(0, 10))
 
 
-def initialize_database():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect('games.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS games (
-            id INTEGER PRIMARY KEY,
-            name TEXT,
-            difficulty TEXT
-        );
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            game_id INT NOT NULL,
-            image_path TEXT NOT NULL,
-            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (game_id) REFERENCES games(id)
-        );
-    ''')
-    conn.close()
-
-
 def main():
     """Main function to run the application"""
     # Initialize database
@@ -648,6 +830,8 @@ def main():
     except:
         pass  # Icon not available, continue without it
 
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
     # Show the dashboard initially
     show_dashboard()
 
@@ -655,4 +839,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # Needed for the PDF worker processes in PyInstaller builds
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the rendering and gallery hot paths.
+
+Synthetic corpora of mixed resolutions and formats are generated once and
+reused. Every benchmark runs in a fresh process so caches start cold and
+the peak memory reading belongs to that benchmark alone. The exception is
+gallery_thumbnails_warm, which reopens a thumbnail cache that another
+process filled, the way the gallery finds it on the next start.
+
+    python run_benchmarks.py --sizes 10 100 --output bench.json
+    python run_benchmarks.py --baseline bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import PIL
+from PIL import Image, ImageDraw
+
+CORPUS_SIZES = [10, 100, 1000, 10000]
+BENCHMARKS = ['resize_image', 'gallery_thumbnails', 'gallery_thumbnails_warm',
+              'create_circle_with_images', 'create_pdf']
+# Their work is set by the deck order, not by the number of images
+DECK_BENCHMARKS = ('create_circle_with_images', 'create_pdf')
+
+# (width, height, format, mode) cycled through when generating a corpus
+IMAGE_VARIANTS = [
+    (64, 64, 'PNG', 'RGBA'),
+    (640, 480, 'JPEG', 'RGB'),
+    (256, 256, 'PNG', 'P'),
+    (1920, 1080, 'JPEG', 'RGB'),
+    (1024, 768, 'PNG', 'RGBA'),
+    (3000, 2000, 'JPEG', 'RGB'),
+]
+
+
+def corpus_path(corpus_dir, size):
+    return os.path.join(corpus_dir, str(size))
+
+
+def generate_corpus(corpus_dir, size):
+    """Create the synthetic images of one corpus, existing corpora are reused"""
+    folder = corpus_path(corpus_dir, size)
+    marker = os.path.join(folder, '.complete')
+    if os.path.exists(marker):
+        return folder
+
+    os.makedirs(folder, exist_ok=True)
+    for i in range(size):
+        width, height, image_format, mode = IMAGE_VARIANTS[i % len(IMAGE_VARIANTS)]
+        image = Image.new('RGBA' if mode == 'RGBA' else 'RGB', (width, height),
+                          (255, 255, 255, 0) if mode == 'RGBA' else 'white')
+        draw = ImageDraw.Draw(image)
+        # Distinct content per file so content-hash caches can't collapse the corpus
+        color = (i * 37 % 256, i * 91 % 256, i * 53 % 256)
+        draw.ellipse((width // 8, height // 8, width * 7 // 8, height * 7 // 8), fill=color)
+        draw.text((width // 3, height // 2), str(i), fill='black')
+        if mode == 'P':
+            image = image.convert('P')
+        extension = 'png' if image_format == 'PNG' else 'jpg'
+        image.save(os.path.join(folder, f'{i:05}.{extension}'), image_format)
+
+    open(marker, 'w').close()
+    return folder
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def deck_sizes(sizes, max_order):
+    """Corpus sizes that each give a different deck, larger corpora clamped to max_order don't"""
+    from engine import deck_order_for
+
+    orders = set()
+    kept = []
+    for size in sorted(sizes):
+        if size < 7:
+            continue  # no deck can be built from fewer than 7 images
+        order = deck_order_for(size, max_order)
+        if order not in orders:
+            orders.add(order)
+            kept.append(size)
+    return kept
+
+
+def run_benchmark(name, image_folder, max_order, cache_dir=None):
+    """Run one benchmark in the current (fresh) process and return its measurements
+
+    gallery_thumbnails_warm reopens the thumbnail cache in cache_dir, filled
+    beforehand by a gallery_thumbnails run in another process.
+    """
+    import engine
+
+    image_files = sorted(os.path.join(image_folder, f) for f in os.listdir(image_folder)
+                         if f.lower().endswith(engine.IMAGE_EXTENSIONS))
+    work_dir = tempfile.mkdtemp()
+    result = {}
+    # resize_image logs every file, which would drown the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            start = time.perf_counter()
+            if name == 'resize_image':
+                for image_file in image_files:
+                    engine.resize_image(image_file, 100)
+                count = len(image_files)
+            elif name in ('gallery_thumbnails', 'gallery_thumbnails_warm'):
+                cache = engine.ThumbnailCache(cache_dir or os.path.join(work_dir, 'thumbnails'))
+                for image_file in image_files:
+                    cache.get(image_file, 100)
+                cache.flush()
+                count = len(image_files)
+            else:
+                order = engine.deck_order_for(len(image_files), max_order)
+                result['order'] = order
+                deck = engine.Deck(image_files, order)
+                if name == 'create_circle_with_images':
+                    for circle_images in deck:
+                        engine.create_circle_with_images(circle_images, 183)
+                else:
+                    engine.create_pdf(image_folder, os.path.join(work_dir, 'bench.pdf'), deck=deck)
+                count = len(deck)
+            seconds = time.perf_counter() - start
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    result.update(seconds=round(seconds, 4), count=count, peak_rss_mb=peak_rss_mb())
+    return result
+
+
+def run_isolated(name, image_folder, max_order, cache_dir=None):
+    # spawn, not fork, so no memory or caches are inherited from this process
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_benchmark, name, image_folder, max_order, cache_dir).result()
+
+
+def run_warm_gallery(image_folder, max_order):
+    """Time reopening a thumbnail cache that a previous process filled"""
+    cache_dir = tempfile.mkdtemp()
+    try:
+        run_isolated('gallery_thumbnails', image_folder, max_order, cache_dir)
+        return run_isolated('gallery_thumbnails_warm', image_folder, max_order, cache_dir)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def compare(results, baseline, threshold):
+    """Regressions of the results against a baseline, as (key, metric, old, new) tuples"""
+    regressions = []
+    for key, result in sorted(results.items()):
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            if old.get(metric) and result.get(metric) is not None:
+                if result[metric] > old[metric] * (1 + threshold):
+                    regressions.append((key, metric, old[metric], result[metric]))
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark rendering and gallery hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=CORPUS_SIZES,
+                        help="corpus sizes to benchmark")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--corpus-dir', default='bench_corpus',
+                        help="where the synthetic corpora are kept between runs")
+    parser.add_argument('--max-order', type=int, default=11,
+                        help="largest deck order for the card and PDF benchmarks, corpora "
+                             "beyond its deck are skipped by them")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed slowdown or memory growth before failing, 0.2 is 20%%")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    results = {}
+    # A corpus whose deck a smaller one already built would only repeat its numbers
+    decks = deck_sizes(args.sizes, args.max_order)
+    for size in args.sizes:
+        print(f"Preparing corpus of {size} images")
+        image_folder = os.path.abspath(generate_corpus(args.corpus_dir, size))
+        for name in args.benchmarks:
+            if name in DECK_BENCHMARKS and size not in decks:
+                continue
+            if name == 'gallery_thumbnails_warm':
+                result = run_warm_gallery(image_folder, args.max_order)
+            else:
+                result = run_isolated(name, image_folder, args.max_order)
+            results[f'{name}/{size}'] = result
+            print(f"  {name:<28} {result['seconds']:>9.3f}s  {result['count']:>6} items  "
+                  f"peak {result['peak_rss_mb']} MB")
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, metric, old, new in regressions:
+            print(f"REGRESSION {key} {metric}: {old} -> {new}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import unittest
+import os
+import json
+import sys
+import tempfile
+import io
+import shutil
+import zipfile
+import contextlib
+import subprocess
+from unittest.mock import patch
+from PIL import Image
+
+import cli
+from engine import initialize_database, db
+
+
+class TestBatchCli(unittest.TestCase):
+    """Test cases for the headless batch command line"""
+
+    def setUp(self):
+        """Set up a games.db and image folders in a scratch working directory"""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        os.chdir(self.temp_dir)
+        initialize_database()
+
+        for name, difficulty, count in (('Farm Animals', 'Easy', 7), ('Space', 'Hard', 13),
+                                        ('Too Small', 'Easy', 3)):
+            game = db.get_game(db.add_game(name, difficulty))
+            folder = game.image_folder()
+            os.makedirs(folder)
+            paths = [os.path.join(folder, f'{i}.png') for i in range(count)]
+            for i, path in enumerate(paths):
+                Image.new('RGB', (40, 40), color=(i * 30, 0, 0)).save(path)
+            db.add_images(game.id, paths)
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        db.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def run_cli(self, *argv):
+        with patch('sys.stdout'), patch('sys.stderr'):
+            return cli.main(list(argv))
+
+    def test_build_by_id(self):
+        """Test that only the requested games are built"""
+        self.assertEqual(self.run_cli('2', '--jobs', '1'), 0)
+        self.assertTrue(os.path.isfile(os.path.join('documents', 'space.pdf')))
+        self.assertFalse(os.path.isfile(os.path.join('documents', 'farm-animals.pdf')))
+
+    def test_deck_report_is_printed(self):
+        """Test that the deck validation summary is reported by the CLI, not the engine"""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(cli.main(['2', '--jobs', '1']), 0)
+        lines = output.getvalue().splitlines()
+        self.assertNotIn('Deck validation', output.getvalue())
+        self.assertIn("       deck: 13 cards, 0 card pairs not sharing exactly one symbol, "
+                      "symbol usage imbalance 0", lines)
+
+    def test_max_order(self):
+        """Test that --max-order limits the deck and unused images are reported"""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(cli.main(['2', '--jobs', '1', '--max-order', '2']), 0)
+        self.assertIn(", 6 images unused", output.getvalue())
+        with self.assertRaises(SystemExit):
+            self.run_cli('2', '--max-order', '1')
+
+    def test_difficulty_filter_in_parallel(self):
+        """Test the difficulty filter and the job pool, one game has too few images"""
+        self.assertEqual(self.run_cli('--difficulty', 'Easy', '--jobs', '2'), 1)
+        self.assertTrue(os.path.isfile(os.path.join('documents', 'farm-animals.pdf')))
+        self.assertFalse(os.path.isfile(os.path.join('documents', 'too-small.pdf')))
+
+    def test_spare_jobs_render_pages(self):
+        """Test that jobs not taken by a game of their own go to page rendering"""
+        with patch('cli.build_game_pdf', wraps=cli.build_game_pdf) as build_game_pdf:
+            self.assertEqual(self.run_cli('2', '--jobs', '3'), 0)
+        self.assertEqual(build_game_pdf.call_args.kwargs['workers'], 3)
+        with patch('cli.export_game_cards', wraps=cli.export_game_cards) as export_game_cards:
+            self.assertEqual(self.run_cli('2', '--jobs', '2', '--export', 'png', '--dpi', '72'), 0)
+        self.assertEqual(export_game_cards.call_args.kwargs['workers'], 2)
+
+        # Two games on four jobs, each game's worker starts a render pool of its own
+        self.assertEqual(self.run_cli('1', '2', '--jobs', '4'), 0)
+        self.assertTrue(os.path.isfile(os.path.join('documents', 'farm-animals.pdf')))
+        self.assertTrue(os.path.isfile(os.path.join('documents', 'space.pdf')))
+
+    def test_export_cards(self):
+        """Test that --export writes the card archive instead of the PDF"""
+        self.assertEqual(self.run_cli('2', '--export', 'jpeg', '--dpi', '72'), 0)
+        self.assertFalse(os.path.isfile(os.path.join('documents', 'space.pdf')))
+        with zipfile.ZipFile(os.path.join('documents', 'space-cards.zip')) as archive:
+            self.assertEqual(len(archive.namelist()), 13)
+
+    def test_stats_log(self):
+        """Test that every build, failed ones included, is logged from the worker processes"""
+        self.assertEqual(self.run_cli('all', '--jobs', '2', '--stats-log', 'builds.jsonl'), 1)
+        with open('builds.jsonl') as f:
+            records = {record['label']: record for record in map(json.loads, f)}
+        self.assertEqual(sorted(records), [1, 2, 3])
+        self.assertIn('composite', records[2]['stages'])
+        self.assertIsNone(records[2]['error'])
+        self.assertIn('At least 7 images', records[3]['error'])
+
+    def test_unknown_game_fails(self):
+        """Test that a missing game id is reported as a failure"""
+        self.assertEqual(self.run_cli('1', '42', '--jobs', '1'), 1)
+
+    def test_invalid_arguments(self):
+        """Test that 'all' can't be mixed with ids"""
+        with self.assertRaises(SystemExit):
+            self.run_cli('all', '1')
+
+    def test_no_gui_modules_are_imported(self):
+        """Test that the batch entry point never loads tkinter"""
+        code = "import sys, cli; print(any('tkinter' in m or 'ImageTk' in m for m in sys.modules))"
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=self.cwd, text=True)
+        self.assertEqual(output.strip(), 'False')
+
+    def test_numpy_is_imported_on_demand(self):
+        """Test that starting the CLI doesn't pay for the optional NumPy import"""
+        code = "import sys, cli; print('numpy' in sys.modules)"
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=self.cwd, text=True)
+        self.assertEqual(output.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
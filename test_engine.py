@@ -0,0 +1,980 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import sqlite3
+import pickle
+import weakref
+import zipfile
+import itertools
+import math
+import time
+import threading
+from unittest.mock import patch
+from PIL import Image, ImageChops, ImageDraw, PdfParser
+
+import engine
+from engine import (IconCache, ThumbnailCache, CardCache, PdfWriter, Deck, Database, Game,
+                    create_pdf, projective_plane, deck_order_for, validate_deck, ingest_images,
+                    remove_game_image, BuildStats, MemorySink, JsonLogSink, ProfileSink,
+                    BuildCancelled, CardLayout, card_layout, icon_positions, place_randomly,
+                    IconAtlas, icon_atlas, atlas_icon_sizes, ArrayCompositor, export_cards,
+                    Imposition, impose, iter_rendered)
+
+
+def thumbnail_lock_is_free(_):
+    """Runs in a render worker, tells whether it got the thumbnail cache lock"""
+    return engine.thumbnail_cache._lock.acquire(blocking=False)
+
+
+class TestIconCache(unittest.TestCase):
+    """Test cases for the decoded icon cache"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.temp_dir, 'icon.png')
+        Image.new('RGB', (400, 200), color='blue').save(self.image_path)
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_hit_and_miss_counters(self):
+        """Test that repeated lookups are served from the cache"""
+        cache = IconCache()
+        first = cache.get(self.image_path, 100)
+        second = cache.get(self.image_path, 100)
+
+        self.assertIs(first, second)
+        self.assertEqual(first.mode, 'RGBA')
+        self.assertEqual(first.size, (100, 50))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_size_and_mtime_are_part_of_key(self):
+        """Test that a new size or a modified file is decoded again"""
+        cache = IconCache()
+        cache.get(self.image_path, 100)
+        cache.get(self.image_path, 50)
+
+        stat = os.stat(self.image_path)
+        os.utime(self.image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        cache.get(self.image_path, 100)
+
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        """Test that the cache stays under its byte budget"""
+        # One 100x50 RGBA icon is 20000 bytes, room for two of them
+        cache = IconCache(max_bytes=40000)
+        for size in (100, 99, 98):
+            cache.get(self.image_path, size)
+
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertLessEqual(stats['bytes'], 40000)
+
+
+class TestThumbnailCache(unittest.TestCase):
+    """Test cases for the on-disk thumbnail cache"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.image_path = os.path.join(self.temp_dir, 'photo.png')
+        Image.new('RGB', (400, 200), color='green').save(self.image_path)
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_thumbnail_is_reused_across_instances(self):
+        """Test that a second cache instance reads the stored thumbnail"""
+        cache = ThumbnailCache(self.cache_dir)
+        self.assertEqual(cache.get(self.image_path, 100).size, (100, 50))
+        cache.flush()
+
+        with patch('engine.resize_image') as mock_resize:
+            thumbnail = ThumbnailCache(self.cache_dir).get(self.image_path, 100)
+        mock_resize.assert_not_called()
+        self.assertEqual(thumbnail.size, (100, 50))
+
+    def test_changed_file_is_rehashed(self):
+        """Test that a modified source gets a new thumbnail"""
+        cache = ThumbnailCache(self.cache_dir)
+        first_hash = cache.content_hash(self.image_path)
+        Image.new('RGB', (200, 400), color='red').save(self.image_path)
+
+        self.assertNotEqual(cache.content_hash(self.image_path), first_hash)
+        self.assertEqual(cache.get(self.image_path, 100).size, (50, 100))
+
+    def test_identical_content_shares_thumbnail(self):
+        """Test that copies of the same file map to one thumbnail"""
+        copy_path = os.path.join(self.temp_dir, 'copy.png')
+        shutil.copy(self.image_path, copy_path)
+        cache = ThumbnailCache(self.cache_dir)
+        cache.get(self.image_path, 100)
+        cache.get(copy_path, 100)
+
+        thumbnails = [f for f in os.listdir(self.cache_dir) if f.endswith('.png')]
+        self.assertEqual(len(thumbnails), 1)
+
+
+class TestIconAtlas(unittest.TestCase):
+    """Test cases for the memory-mapped icon atlas"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.atlas_path = os.path.join(self.temp_dir, 'atlas', 'game.atlas')
+        self.image_paths = []
+        for i, size in enumerate([(400, 200), (120, 300), (64, 64)]):
+            image_path = os.path.join(self.temp_dir, f'icon{i}.png')
+            Image.new('RGBA', size, color=(i * 80, 40, 200, 128 + i)).save(image_path)
+            self.image_paths.append(image_path)
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_icons_match_decoded_icons_without_decoding(self):
+        """Test that a freshly opened atlas serves the icon cache's pixels without decoding"""
+        IconAtlas(self.atlas_path).ensure(self.image_paths, [61, 100])
+
+        cache = IconCache()
+        cache.attach(IconAtlas(self.atlas_path))
+        with patch('engine.Image.open') as mock_open:
+            icons = [cache.get(path, size) for path in self.image_paths for size in (61, 100)]
+        mock_open.assert_not_called()
+
+        decoded = [IconCache().get(path, size) for path in self.image_paths for size in (61, 100)]
+        for icon, expected in zip(icons, decoded):
+            self.assertEqual(icon.mode, 'RGBA')
+            self.assertEqual(icon.size, expected.size)
+            self.assertEqual(icon.tobytes(), expected.tobytes())
+        self.assertEqual(cache.stats()['atlas_hits'], 6)
+        self.assertEqual(cache.stats()['misses'], 0)
+
+    def test_rebuilt_only_when_images_change(self):
+        """Test that the atlas is rebuilt for new images or sizes and edited files"""
+        atlas = IconAtlas(self.atlas_path)
+        self.assertTrue(atlas.ensure(self.image_paths[:2], [61]))
+        self.assertFalse(atlas.ensure(self.image_paths[:2], [61]))
+        self.assertTrue(atlas.ensure(self.image_paths, [61]))
+        self.assertTrue(atlas.ensure(self.image_paths, [61, 30]))
+
+        stat = os.stat(self.image_paths[0])
+        os.utime(self.image_paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        self.assertIsNone(atlas.get((os.path.abspath(self.image_paths[0]),
+                                     stat.st_mtime_ns + 1000000, 61)))
+        self.assertTrue(atlas.ensure(self.image_paths, [61, 30]))
+        self.assertFalse(IconAtlas(self.atlas_path).ensure(self.image_paths, [61, 30]))
+        self.assertEqual([f for f in os.listdir(os.path.dirname(self.atlas_path))],
+                         ['game.atlas'])
+
+    def test_sizes_of_other_builds_are_kept(self):
+        """Test that alternating resolutions add to the atlas instead of replacing it"""
+        atlas = IconAtlas(self.atlas_path)
+        self.assertTrue(atlas.ensure(self.image_paths, [61]))
+        self.assertTrue(atlas.ensure(self.image_paths, [200]))
+        self.assertFalse(atlas.ensure(self.image_paths, [61]))
+        self.assertFalse(atlas.ensure(self.image_paths, [200, 61]))
+
+        def key(image_path, size):
+            return os.path.abspath(image_path), os.stat(image_path).st_mtime_ns, size
+
+        for image_path in self.image_paths:
+            for size in (61, 200):
+                self.assertEqual(atlas.get(key(image_path, size)).tobytes(),
+                                 IconCache().get(image_path, size).tobytes())
+
+        # Only the edited image is decoded again, images no longer in the game are dropped
+        stat = os.stat(self.image_paths[0])
+        os.utime(self.image_paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        with patch('engine.Image.open', wraps=Image.open) as mock_open:
+            self.assertTrue(atlas.ensure(self.image_paths[:2], [61]))
+        self.assertEqual(mock_open.call_count, 1)
+        self.assertIsNone(atlas.get(key(self.image_paths[2], 61)))
+        self.assertIsNotNone(atlas.get(key(self.image_paths[1], 200)))
+        self.assertIsNone(atlas.get(key(self.image_paths[0], 200)))
+
+    def test_pickled_atlas_is_the_shared_instance(self):
+        """Test that workers get one atlas per file instead of mapping it per task"""
+        atlas = icon_atlas(self.atlas_path)
+        self.assertIs(pickle.loads(pickle.dumps(atlas)), atlas)
+        self.assertIs(icon_atlas(self.atlas_path), atlas)
+
+
+class TestCardLayout(unittest.TestCase):
+    """Test cases for the cached card layout geometry"""
+
+    def test_layouts_are_shared(self):
+        """Test that cards of the same kind reuse one layout"""
+        self.assertIs(card_layout(183, 8, 'grid'), card_layout(183, 8, 'grid'))
+        self.assertIsNot(card_layout(183, 8, 'grid'), card_layout(183, 8, 'multi-ring'))
+
+    def test_ring_matches_icon_positions(self):
+        """Test that the ring layout keeps the classic icon positions"""
+        layout = card_layout(183, 8, 'ring')
+        self.assertEqual([(x, y) for x, y, _ in layout.slots], icon_positions(8, 183))
+        self.assertTrue(all(size == 61 for _, _, size in layout.slots))
+
+    def test_slots_fit_the_card_without_overlapping(self):
+        """Test every style for the symbol counts of the supported deck orders"""
+        d = 183
+        for style in ('grid', 'multi-ring'):
+            for n in (3, 4, 6, 8, 12, 14, 18, 20):
+                slots = CardLayout(d, n, style).slots
+                self.assertEqual(len(slots), n)
+                for x, y, size in slots:
+                    for corner_x, corner_y in ((x, y), (x + size, y), (x, y + size),
+                                               (x + size, y + size)):
+                        self.assertLessEqual((corner_x - d / 2) ** 2 + (corner_y - d / 2) ** 2,
+                                             (d / 2 + 0.5) ** 2, (style, n))
+                for (ax, ay, a), (bx, by, b) in itertools.combinations(slots, 2):
+                    overlap = ax < bx + b and bx < ax + a and ay < by + b and by < ay + a
+                    self.assertFalse(overlap, (style, n))
+
+    def test_unknown_style_is_rejected(self):
+        """Test that a typo in the style name raises"""
+        with self.assertRaises(ValueError):
+            CardLayout(183, 8, 'spiral')
+
+
+class TestImposition(unittest.TestCase):
+    """Test cases for packing cards onto sheets"""
+
+    def test_default_sheet_keeps_twelve_cards(self):
+        """Test that A4 cards of the usual size stay in a square grid of twelve"""
+        imposition = impose()
+        self.assertEqual(imposition.packing, 'square')
+        self.assertEqual(imposition.cards_per_page, 12)
+        self.assertIs(impose(), imposition)
+
+    def test_densest_packing_wins(self):
+        """Test that hexagonal packing is picked once it fits more cards"""
+        square = Imposition(612, 792, 150, packing='square')
+        hexagonal = Imposition(612, 792, 150, packing='hex')
+        self.assertEqual((square.cards_per_page, hexagonal.cards_per_page), (12, 16))
+        self.assertEqual(impose('letter', 150).packing, 'hex')
+
+    def test_cards_stay_apart_and_on_the_sheet(self):
+        """Test that every card and its bleed fits the sheet without touching another"""
+        for paper, diameter, bleed in [('a4', 120, 7.5), ('a3', 250, 0), ('legal', 150, 12)]:
+            imposition = impose(paper, diameter, bleed)
+            width, height = engine.PAPER_SIZES[paper]
+            centers = [(x + diameter / 2, y + diameter / 2) for x, y in imposition.positions]
+            for x, y in centers:
+                self.assertGreaterEqual(min(x, y, width - x, height - y),
+                                        diameter / 2 + bleed - 1e-6)
+            for (x1, y1), (x2, y2) in itertools.combinations(centers, 2):
+                self.assertGreaterEqual(math.hypot(x1 - x2, y1 - y2), diameter + 2 * bleed - 1e-6)
+
+    def test_impossible_sheets_are_rejected(self):
+        """Test that unknown papers and cards bigger than the sheet raise"""
+        with self.assertRaises(ValueError):
+            impose('a5')
+        with self.assertRaises(ValueError):
+            impose('a4', 600)
+        with self.assertRaises(ValueError):
+            impose('a4', packing='triangle')
+
+
+class TestRandomPlacement(unittest.TestCase):
+    """Test cases for random icon placement"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_paths = []
+        for i in range(14):
+            image = Image.new('RGBA', (90 + i * 5, 60), (0, 0, 0, 0))
+            ImageDraw.Draw(image).ellipse((0, 0, image.width - 1, 59), fill=(i * 18, 90, 200))
+            path = os.path.join(self.temp_dir, f'{i}.png')
+            image.save(path)
+            self.image_paths.append(path)
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_seed_makes_placement_reproducible(self):
+        """Test that a seed always gives the same card and another seed a different one"""
+        first = place_randomly(self.image_paths[:8], 183, seed=3)
+        self.assertEqual(first, place_randomly(self.image_paths[:8], 183, seed=3))
+        self.assertNotEqual(first, place_randomly(self.image_paths[:8], 183, seed=4))
+
+    def assert_apart_and_on_the_card(self, image_paths, d, seed):
+        placements = place_randomly(image_paths, d, seed)
+        inside = Image.new('L', (d, d), 0)
+        ImageDraw.Draw(inside).ellipse((0, 0, d - 1, d - 1), fill=255)
+        covered = Image.new('L', (d, d), 0)
+        for image_path, (cx, cy, size, angle) in zip(image_paths, placements):
+            icon = engine.icon_cache.get(image_path, size).rotate(
+                angle, expand=True, resample=Image.Resampling.BICUBIC)
+            alpha = Image.new('L', (d, d), 0)
+            alpha.paste(icon.getchannel('A'), (round(cx - icon.width / 2),
+                                               round(cy - icon.height / 2)))
+            self.assertIsNone(ImageChops.multiply(covered, alpha).getbbox(), (d, seed))
+            self.assertIsNone(ImageChops.subtract(alpha, inside).getbbox(), (d, seed))
+            covered = ImageChops.lighter(covered, alpha)
+        return placements
+
+    def test_icons_stay_apart_and_on_the_card(self):
+        """Test the rotated icons' pixels for overlaps and for leaving the circle"""
+        for n in (3, 8, 14):
+            for seed in range(5):
+                self.assert_apart_and_on_the_card(self.image_paths[:n], 183, seed)
+
+    def test_small_cards_are_placed_randomly(self):
+        """Test that the occupancy cells shrink with the card so small cards still fit"""
+        # Opaque squares leave no transparent corners to nest into
+        image_paths = []
+        for i in range(8):
+            path = os.path.join(self.temp_dir, f'square{i}.png')
+            Image.new('RGBA', (120, 120), (i * 30, 90, 200, 255)).save(path)
+            image_paths.append(path)
+        for seed in range(10):
+            placements = self.assert_apart_and_on_the_card(image_paths, 100, seed)
+            self.assertTrue(any(angle for _, _, _, angle in placements), seed)
+
+    def test_crowded_card_falls_back_to_the_grid(self):
+        """Test that a card with no room left is laid out upright instead of failing"""
+        with patch('engine.find_spot', return_value=None):
+            placements = place_randomly(self.image_paths[:8], 100)
+        slots = card_layout(100, 8, 'grid').slots
+        self.assertEqual(placements, [(x + size / 2, y + size / 2, size, 0)
+                                      for x, y, size in slots])
+
+    def test_dense_card_places_quickly(self):
+        """Test that an 8 symbol card is placed in milliseconds"""
+        place_randomly(self.image_paths[:8], 183)
+        start = time.perf_counter()
+        for seed in range(20):
+            place_randomly(self.image_paths[:8], 183, seed)
+        self.assertLess((time.perf_counter() - start) / 20, 0.05)
+
+
+class TestDeck(unittest.TestCase):
+    """Test cases for the projective-plane deck engine"""
+
+    def test_any_two_cards_share_exactly_one_symbol(self):
+        """Test the defining property of the deck for several orders"""
+        for order in (2, 3, 5, 7):
+            cards = projective_plane(order)
+            num_cards = order * order + order + 1
+            self.assertEqual(len(cards), num_cards)
+            self.assertTrue(all(len(set(card)) == order + 1 for card in cards))
+            self.assertEqual(set().union(*cards), set(range(num_cards)))
+            for i in range(num_cards):
+                for j in range(i + 1, num_cards):
+                    self.assertEqual(len(set(cards[i]) & set(cards[j])), 1)
+
+    def test_non_prime_order_is_rejected(self):
+        """Test that orders without a construction raise"""
+        with self.assertRaises(ValueError):
+            projective_plane(6)
+
+    def test_order_is_picked_from_image_count(self):
+        """Test that the largest order fitting the images is used"""
+        self.assertEqual(deck_order_for(7), 2)
+        self.assertEqual(deck_order_for(57), 7)
+        self.assertEqual(deck_order_for(130), 7)
+        self.assertEqual(deck_order_for(133), 11)
+        with self.assertRaises(ValueError):
+            deck_order_for(6)
+
+    def test_default_deck_is_capped_and_reports_unused_images(self):
+        """Test that large games get the standard deck and the images left out are counted"""
+        images = [f'{i}.png' for i in range(200)]
+        deck = Deck(images)
+        self.assertEqual(deck.order, 7)
+        self.assertEqual(deck.unused_images, 143)
+        report = deck.validate()
+        self.assertTrue(report.summary().endswith(", 143 images unused"))
+        self.assertEqual(Deck(images, max_order=13).order, 13)
+        self.assertEqual(Deck(images[:57]).validate().summary().count("unused"), 0)
+
+    def test_deck_maps_symbols_to_images(self):
+        """Test that cards are handed out as image paths"""
+        images = [f'{i}.png' for i in range(20)]
+        deck = Deck(images, order=3)
+        cards = list(deck)
+
+        self.assertEqual(len(deck), 13)
+        self.assertEqual(cards[0], ['0.png', '1.png', '2.png', '3.png'])
+        self.assertTrue(all(image in images[:13] for card in cards for image in card))
+        with self.assertRaises(ValueError):
+            Deck(images, order=5)
+
+
+class TestDeckValidation(unittest.TestCase):
+    """Test cases for the bitset deck validator"""
+
+    def test_projective_plane_is_valid(self):
+        """Test that generated decks pass with a balanced symbol usage"""
+        report = Deck([f'{i}.png' for i in range(57)]).validate()
+
+        self.assertTrue(report.is_valid)
+        self.assertEqual(report.num_cards, 57)
+        self.assertEqual(report.imbalance, 0)
+
+    def test_violations_are_reported(self):
+        """Test that pairs sharing zero or several symbols are found"""
+        cards = [(0, 1, 2), (0, 1, 3), (4, 5, 6), (2, 4, 7)]
+        report = validate_deck(cards, 8)
+
+        self.assertFalse(report.is_valid)
+        self.assertIn((0, 1, 2), report.violations)
+        self.assertIn((0, 2, 0), report.violations)
+        self.assertIn((1, 2, 0), report.violations)
+        self.assertIn((1, 3, 0), report.violations)
+        self.assertEqual(report.num_violations, 4)
+        self.assertEqual(report.imbalance, 1)
+
+    def test_large_deck(self):
+        """Test that a deck of several hundred cards validates"""
+        report = validate_deck(projective_plane(19), 19 * 19 + 19 + 1)
+        self.assertTrue(report.is_valid)
+        self.assertEqual(report.num_cards, 381)
+
+
+class TestCreatePdf(unittest.TestCase):
+    """Test cases for PDF generation"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_folder = os.path.join(self.temp_dir, 'images')
+        os.makedirs(self.image_folder)
+        # 130 images give an order 7 deck, 57 cards on five pages
+        for i in range(130):
+            color = (i * 2 % 256, i * 5 % 256, i * 11 % 256)
+            Image.new('RGB', (80, 60), color=color).save(
+                os.path.join(self.image_folder, f'{i:03}.png'))
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def read_pdf(self, path):
+        """Read a PDF's bytes so two builds can be compared"""
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_parallel_output_matches_serial(self):
+        """Test that the process pool renders the same pages in the same order"""
+        serial_pdf = os.path.join(self.temp_dir, 'serial.pdf')
+        parallel_pdf = os.path.join(self.temp_dir, 'parallel.pdf')
+        create_pdf(self.image_folder, serial_pdf, workers=1)
+        create_pdf(self.image_folder, parallel_pdf, workers=2)
+
+        self.assertEqual(self.read_pdf(serial_pdf), self.read_pdf(parallel_pdf))
+
+    def test_pdf_pages_are_written(self):
+        """Test that every card of the deck ends up on a page of the PDF"""
+        output_pdf = os.path.join(self.temp_dir, 'cards.pdf')
+        create_pdf(self.image_folder, output_pdf)
+
+        pdf = PdfParser.PdfParser(output_pdf)
+        try:
+            self.assertEqual(len(pdf.pages), 5)
+        finally:
+            pdf.close()
+
+    def test_vector_engine_embeds_each_icon_once(self):
+        """Test that the vector engine shares one image object per symbol"""
+        output_pdf = os.path.join(self.temp_dir, 'vector.pdf')
+        create_pdf(self.image_folder, output_pdf, engine='vector')
+
+        with open(output_pdf, 'rb') as f:
+            data = f.read()
+        # An order 7 deck uses 57 of the images
+        self.assertEqual(data.count(b'/Subtype /Image'), 57)
+        pdf = PdfParser.PdfParser(output_pdf)
+        try:
+            self.assertEqual(len(pdf.pages), 5)
+        finally:
+            pdf.close()
+
+    def test_print_dpi_renders_cards_at_full_resolution(self):
+        """Test that every card becomes its own image at the requested dpi"""
+        output_pdf = os.path.join(self.temp_dir, 'print.pdf')
+        create_pdf(self.image_folder, output_pdf, dpi=144)
+
+        with open(output_pdf, 'rb') as f:
+            data = f.read()
+        # 183pt cards at twice the default resolution
+        self.assertEqual(data.count(b'/Width 366 /Height 366'), 57)
+        pdf = PdfParser.PdfParser(output_pdf)
+        try:
+            self.assertEqual(len(pdf.pages), 5)
+        finally:
+            pdf.close()
+
+    def test_card_cache_only_rerenders_changed_cards(self):
+        """Test that a rebuild reuses every card whose images did not change"""
+        cache = CardCache(os.path.join(self.temp_dir, 'cards'))
+        os.makedirs(os.path.join(self.temp_dir, 'first'))
+        os.makedirs(os.path.join(self.temp_dir, 'second'))
+        first_pdf = os.path.join(self.temp_dir, 'first', 'cards.pdf')
+        second_pdf = os.path.join(self.temp_dir, 'second', 'cards.pdf')
+
+        with patch('engine.thumbnail_cache', ThumbnailCache(os.path.join(self.temp_dir, 'thumbs'))):
+            create_pdf(self.image_folder, first_pdf, card_cache=cache)
+            with patch('engine.create_circle_with_images') as mock_render:
+                create_pdf(self.image_folder, second_pdf, card_cache=cache)
+            mock_render.assert_not_called()
+            self.assertEqual(self.read_pdf(first_pdf), self.read_pdf(second_pdf))
+
+            # Symbol 0 of an order 7 deck is on 8 of the 57 cards
+            Image.new('RGB', (80, 60), color='white').save(
+                os.path.join(self.image_folder, '000.png'))
+            with patch('engine.create_circle_with_images', wraps=engine.create_circle_with_images) as mock_render:
+                create_pdf(self.image_folder, second_pdf, card_cache=cache)
+            self.assertEqual(mock_render.call_count, 8)
+
+    def test_stages_are_recorded_in_workers(self):
+        """Test that stages recorded in render workers end up in the build's stats"""
+        with BuildStats('cards') as stats:
+            create_pdf(self.image_folder, os.path.join(self.temp_dir, 'cards.pdf'), workers=2)
+        summary = stats.summary()['stages']
+        self.assertEqual(summary['composite']['count'], 57)
+        self.assertEqual(summary['page_paste']['count'], 57)
+        self.assertEqual(summary['pdf_encode']['count'], 5)
+        self.assertGreater(summary['pdf_encode']['bytes'], 0)
+        self.assertGreater(stats.seconds, 0)
+
+    def test_stats_sinks(self):
+        """Test that every sink receives the build summary"""
+        memory = MemorySink()
+        log_path = os.path.join(self.temp_dir, 'logs', 'builds.jsonl')
+        profile_dir = os.path.join(self.temp_dir, 'profiles')
+        sinks = [memory, JsonLogSink(log_path), ProfileSink(profile_dir)]
+        for _ in range(2):
+            with BuildStats(7, sinks):
+                create_pdf(self.image_folder, os.path.join(self.temp_dir, 'cards.pdf'))
+
+        self.assertEqual(memory.get(7)['stages']['composite']['count'], 57)
+        self.assertIsNone(memory.get(7)['error'])
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['label'], 7)
+        self.assertTrue(os.path.isfile(os.path.join(profile_dir, '7.prof')))
+
+    def test_progress_is_reported_per_page_and_card(self):
+        """Test that pages report the cards they hold and print builds every card"""
+        pages = []
+        create_pdf(self.image_folder, os.path.join(self.temp_dir, 'cards.pdf'), workers=2,
+                   progress=lambda *counts: pages.append(counts))
+        self.assertEqual(pages, [(12, 57, 1, 5), (24, 57, 2, 5), (36, 57, 3, 5),
+                                 (48, 57, 4, 5), (57, 57, 5, 5)])
+
+        cards = []
+        create_pdf(self.image_folder, os.path.join(self.temp_dir, 'print.pdf'), dpi=72,
+                   progress=lambda *counts: cards.append(counts))
+        self.assertEqual(len(cards), 57)
+        self.assertEqual(cards[11], (12, 57, 1, 5))
+        self.assertEqual(cards[-1], (57, 57, 5, 5))
+
+    def test_workers_do_not_inherit_held_locks(self):
+        """Test that render workers start clean while another thread holds a cache lock"""
+        holding, done = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with engine.thumbnail_cache._lock:
+                holding.set()
+                done.wait(30)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(holding.wait(5))
+            self.assertEqual(list(iter_rendered(range(2), thumbnail_lock_is_free, workers=2)),
+                             [True, True])
+        finally:
+            done.set()
+            holder.join()
+
+    def test_cancelled_build_leaves_no_partial_file(self):
+        """Test that cancelling keeps the previous PDF and removes the partial one"""
+        output_pdf = os.path.join(self.temp_dir, 'cards.pdf')
+        with open(output_pdf, 'wb') as f:
+            f.write(b'previous build')
+        cancel = threading.Event()
+
+        def cancel_after_two_pages(cards, total_cards, pages, total_pages):
+            if pages == 2:
+                cancel.set()
+
+        for workers in (1, 2):
+            with self.assertRaises(BuildCancelled):
+                create_pdf(self.image_folder, output_pdf, workers=workers,
+                           progress=cancel_after_two_pages, cancel=cancel)
+            cancel.clear()
+            with open(output_pdf, 'rb') as f:
+                self.assertEqual(f.read(), b'previous build')
+            self.assertEqual(sorted(os.listdir(self.temp_dir)), ['cards.pdf', 'images'])
+
+    def test_layouts_in_every_engine(self):
+        """Test that the layout option reaches the raster, print and vector engines"""
+        for layout, options in itertools.product(('grid', 'random'),
+                                                 ({}, {'dpi': 144}, {'engine': 'vector'})):
+            output_pdf = os.path.join(self.temp_dir, 'layout.pdf')
+            create_pdf(self.image_folder, output_pdf, layout=layout, **options)
+            pdf = PdfParser.PdfParser(output_pdf)
+            try:
+                self.assertEqual(len(pdf.pages), 5)
+            finally:
+                pdf.close()
+        with self.assertRaises(ValueError):
+            create_pdf(self.image_folder, os.path.join(self.temp_dir, 'x.pdf'), layout='spiral')
+
+    def test_icon_atlas_replaces_decoding(self):
+        """Test that builds from the atlas match decoded builds in every engine"""
+        settings = [('raster', None, 'ring'), ('raster', 100, 'grid'), ('vector', 100, 'random')]
+        for pdf_engine, dpi, layout in settings:
+            with self.subTest(engine=pdf_engine, dpi=dpi, layout=layout):
+                decoded_pdf = os.path.join(self.temp_dir, 'decoded.pdf')
+                atlas_pdf = os.path.join(self.temp_dir, 'atlas.pdf')
+                atlas = IconAtlas(os.path.join(self.temp_dir, f'{pdf_engine}{dpi}.atlas'))
+                engine.icon_cache.clear()
+                create_pdf(self.image_folder, decoded_pdf, engine=pdf_engine, dpi=dpi,
+                           layout=layout)
+                engine.icon_cache.clear()
+                create_pdf(self.image_folder, atlas_pdf, engine=pdf_engine, dpi=dpi,
+                           layout=layout, icon_atlas=atlas)
+
+                self.assertEqual(self.read_pdf(atlas_pdf), self.read_pdf(decoded_pdf))
+                self.assertEqual(engine.icon_cache.stats()['misses'], 0)
+                self.assertGreater(engine.icon_cache.stats()['atlas_hits'], 0)
+        engine.icon_cache.clear()
+
+    def test_hexagonal_imposition_saves_pages(self):
+        """Test that every engine prints the densest packing on the chosen paper"""
+        for options in ({}, {'dpi': 72}, {'engine': 'vector'}):
+            pages = []
+            for packing in ('square', None):
+                output_pdf = os.path.join(self.temp_dir, f'{packing}.pdf')
+                create_pdf(self.image_folder, output_pdf, paper='letter', card_diameter=150,
+                           packing=packing, **options)
+                pdf = PdfParser.PdfParser(output_pdf)
+                try:
+                    pages.append(len(pdf.pages))
+                    self.assertEqual(pdf.read_indirect(pdf.pages[0])[b'MediaBox'],
+                                     [0, 0, 612, 792])
+                finally:
+                    pdf.close()
+            # 57 cards, 12 or 16 to a sheet
+            self.assertEqual(pages, [5, 4])
+
+    def test_atlas_sizes_cover_print_resolution(self):
+        """Test that the atlas holds the print sizes rather than the 72 dpi ones"""
+        self.assertEqual(atlas_icon_sizes(183, 8, 'ring'), [61])
+        self.assertEqual(atlas_icon_sizes(183, 8, 'ring', dpi=144), [122])
+        self.assertEqual(atlas_icon_sizes(183, 8, 'ring', 'vector', 144), [122])
+
+    @unittest.skipIf(engine.import_numpy() is None, "NumPy is not installed")
+    def test_numpy_compositor_matches_pillow(self):
+        """Test that both compositors give the same pixels, with and without cached cards"""
+        # Soft-edged translucent icons exercise every blend
+        for i in range(0, 130, 3):
+            icon = Image.new('RGBA', (90, 70), (0, 0, 0, 0))
+            ImageDraw.Draw(icon).ellipse((5, 5, 85, 65), fill=(i, 255 - i, 90, 40 + i))
+            icon.resize((45, 35)).save(os.path.join(self.image_folder, f'{i:03}.png'))
+
+        thumbnails = ThumbnailCache(os.path.join(self.temp_dir, 'thumbs'))
+        for options in ({}, {'dpi': 100}, {'layout': 'random'}):
+            with self.subTest(**options), patch('engine.thumbnail_cache', thumbnails):
+                card_cache = CardCache(os.path.join(self.temp_dir, 'cards', str(options)))
+                outputs = []
+                for compositor, cache in [('pillow', None), ('numpy', None),
+                                          ('numpy', card_cache), ('numpy', card_cache)]:
+                    output_pdf = os.path.join(self.temp_dir, f'{compositor}{len(outputs)}.pdf')
+                    create_pdf(self.image_folder, output_pdf, card_cache=cache,
+                               compositor=compositor, **options)
+                    outputs.append(self.read_pdf(output_pdf))
+                self.assertEqual(outputs, outputs[:1] * 4)
+
+    @unittest.skipIf(engine.import_numpy() is None, "NumPy is not installed")
+    def test_array_compositor_card_matches_pillow_card(self):
+        """Test that the card handed to the card cache is the one Pillow renders"""
+        deck = engine.load_deck(self.image_folder)
+        circle_images = next(iter(deck))
+        arrays = ArrayCompositor(200, 200)
+        card = arrays.draw(circle_images, 5, 5, 183, return_card=True)
+        expected = engine.create_circle_with_images(circle_images, 183)
+
+        self.assertIsNone(ImageChops.difference(card, expected).getbbox())
+        page = Image.new('RGB', (200, 200), 'white')
+        page.paste(expected, (5, 5), expected)
+        self.assertIsNone(ImageChops.difference(arrays.image(), page).getbbox())
+
+    def test_numpy_compositor_needs_numpy(self):
+        """Test that asking for the numpy compositor without NumPy fails up front"""
+        with patch('engine.import_numpy', return_value=None), self.assertRaises(ValueError):
+            create_pdf(self.image_folder, os.path.join(self.temp_dir, 'x.pdf'),
+                       compositor='numpy')
+        with self.assertRaises(ValueError):
+            create_pdf(self.image_folder, os.path.join(self.temp_dir, 'x.pdf'),
+                       compositor='cairo')
+
+    def test_unknown_engine_is_rejected(self):
+        """Test that a typo in the engine name raises"""
+        with self.assertRaises(ValueError):
+            create_pdf(self.image_folder, os.path.join(self.temp_dir, 'x.pdf'), engine='svg')
+
+
+class TestExportCards(unittest.TestCase):
+    """Test cases for exporting cards as separate images"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_paths = []
+        # 13 images give an order 3 deck of 13 cards
+        for i in range(13):
+            image_path = os.path.join(self.temp_dir, f'{i:02}.png')
+            Image.new('RGB', (80, 60), color=(i * 19, 255 - i * 19, 90)).save(image_path)
+            self.image_paths.append(image_path)
+        self.deck = Deck(self.image_paths)
+        self.output_zip = os.path.join(self.temp_dir, 'cards.zip')
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_png_cards_in_parallel(self):
+        """Test that worker processes fill the archive with one PNG per card, clear corners"""
+        export_cards(self.deck, self.output_zip, 'png', dpi=144, workers=2)
+
+        with zipfile.ZipFile(self.output_zip) as archive:
+            names = archive.namelist()
+            self.assertEqual(names, [f'card-{i:03}.png' for i in range(1, 14)])
+            self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED
+                                for info in archive.infolist()))
+            with archive.open(names[0]) as f:
+                card = Image.open(f)
+                card.load()
+        self.assertEqual(card.size, (366, 366))
+        self.assertEqual(card.getpixel((0, 0))[3], 0)
+        expected = engine.create_circle_with_images(next(iter(self.deck)), 366, 2)
+        self.assertIsNone(ImageChops.difference(card, expected).getbbox())
+
+    def test_jpeg_cards_are_the_printed_cards(self):
+        """Test that JPEG export gives the same files create_pdf prints, progress included"""
+        progress = []
+        export_cards(self.deck, self.output_zip, 'jpeg', dpi=100,
+                     progress=lambda *counts: progress.append(counts))
+
+        with zipfile.ZipFile(self.output_zip) as archive:
+            data = archive.read('card-001.jpg')
+        expected = engine.render_print_card(next(iter(self.deck)), round(183 * 100 / 72),
+                                            100 / 72)[1]
+        self.assertEqual(data, expected)
+        self.assertEqual(progress[-1], (13, 13, 0, 0))
+
+    def test_cancelled_export_leaves_no_archive(self):
+        """Test that a cancelled export removes its partial archive"""
+        cancel = threading.Event()
+        with self.assertRaises(BuildCancelled):
+            export_cards(self.deck, self.output_zip, dpi=72,
+                         progress=lambda cards, *rest: cards == 3 and cancel.set(),
+                         cancel=cancel)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         [os.path.basename(p) for p in self.image_paths])
+        with self.assertRaises(ValueError):
+            export_cards(self.deck, self.output_zip, 'gif')
+
+
+class TestPdfWriter(unittest.TestCase):
+    """Test cases for the streaming PDF writer"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_pdf = os.path.join(self.temp_dir, 'pages.pdf')
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pages_are_not_retained(self):
+        """Test that the writer drops each page once it has been written"""
+        with PdfWriter(self.output_pdf) as writer:
+            page = Image.new('RGB', (595, 842), 'white')
+            page_ref = weakref.ref(page)
+            writer.add_page(page)
+            del page
+            self.assertIsNone(page_ref())
+            writer.add_page(Image.new('L', (595, 842), 128))
+
+        pdf = PdfParser.PdfParser(self.output_pdf)
+        try:
+            self.assertEqual(len(pdf.pages), 2)
+            media_box = pdf.read_indirect(pdf.pages[0])[b'MediaBox']
+            self.assertEqual(list(media_box), [0, 0, 595, 842])
+        finally:
+            pdf.close()
+
+
+class TestDatabase(unittest.TestCase):
+    """Test cases for the shared data-access layer"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        os.chdir(self.temp_dir)
+        self.db = Database('games.db')
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        self.db.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_wal_mode_and_indexes(self):
+        """Test that the connection uses WAL and images are indexed by game"""
+        self.db.initialize()
+        self.assertEqual(self.db.conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        plan = self.db.conn.execute(
+            'EXPLAIN QUERY PLAN ' + Database.SELECT_IMAGES, (1,)).fetchall()
+        self.assertIn('idx_images_game_path', ' '.join(row[-1] for row in plan))
+
+    def test_image_catalog(self):
+        """Test adding, listing and removing catalogued images"""
+        self.db.initialize()
+        game_id = self.db.add_game('Zoo', 'Easy')
+        self.db.add_images(game_id, ['images/1/b.png', 'images/1/a.png', 'images/1/a.png'])
+
+        self.assertEqual(self.db.list_images(game_id), ['images/1/a.png', 'images/1/b.png'])
+        self.db.remove_image(game_id, 'images/1/a.png')
+        self.assertEqual(self.db.count_images(game_id), 1)
+        self.assertEqual([game.name for game in self.db.get_games(difficulty='Easy')], ['Zoo'])
+        self.assertEqual(self.db.get_games(difficulty='Hard'), [])
+
+    def test_existing_images_are_moved_to_blob_store_once(self):
+        """Test that per-game copies from before the catalog are imported on upgrade"""
+        conn = sqlite3.connect('games.db')
+        conn.execute('CREATE TABLE games (id INTEGER PRIMARY KEY, name TEXT, difficulty TEXT)')
+        conn.executemany('INSERT INTO games VALUES (?, ?, ?)', [(1, 'Old', 'Hard'), (2, 'Copy', 'Easy')])
+        conn.commit()
+        conn.close()
+        # Game 2 holds a copy of game 1's x.PNG under another name
+        for game_id, name, data in (('1', 'x.PNG', b'x'), ('1', 'y.jpg', b'y'),
+                                    ('1', 'notes.txt', b'n'), ('2', 'same.png', b'x')):
+            os.makedirs(os.path.join('images', game_id), exist_ok=True)
+            with open(os.path.join('images', game_id, name), 'wb') as f:
+                f.write(data)
+
+        self.db.initialize()
+        self.db.initialize()
+        records = dict((name, path) for path, name in self.db.list_image_records(1))
+        self.assertEqual(sorted(records), ['x.PNG', 'y.jpg'])
+        self.assertTrue(records['x.PNG'].startswith(os.path.join('images', 'blobs')))
+        self.assertTrue(records['x.PNG'].endswith('.png'))
+        self.assertEqual(self.db.list_images(2), [records['x.PNG']])
+        self.assertFalse(os.path.exists(os.path.join('images', '1', 'x.PNG')))
+        self.assertTrue(os.path.exists(os.path.join('images', '1', 'notes.txt')))
+
+    def test_failed_move_keeps_the_originals(self):
+        """Test that a move failing half way loses no image, the next start finishes it"""
+        conn = sqlite3.connect('games.db')
+        conn.execute('CREATE TABLE games (id INTEGER PRIMARY KEY, name TEXT, difficulty TEXT)')
+        conn.execute("INSERT INTO games VALUES (1, 'Old', 'Hard')")
+        conn.commit()
+        conn.close()
+        os.makedirs(os.path.join('images', '1'))
+        for name in ('a.png', 'b.png'):
+            with open(os.path.join('images', '1', name), 'wb') as f:
+                f.write(name.encode())
+
+        add_file = engine.blob_store.add_file
+        calls = []
+
+        def failing_add_file(file_path):
+            calls.append(file_path)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            return add_file(file_path)
+
+        with patch.object(engine.blob_store, 'add_file', failing_add_file), \
+                self.assertRaises(OSError):
+            self.db.initialize()
+        self.assertEqual(sorted(os.listdir(os.path.join('images', '1'))), ['a.png', 'b.png'])
+
+        self.db.close()
+        self.db = Database('games.db')
+        self.db.initialize()
+        self.assertEqual(sorted(name for _, name in self.db.list_image_records(1)),
+                         ['a.png', 'b.png'])
+        self.assertEqual(os.listdir(os.path.join('images', '1')), [])
+
+
+class TestIngest(unittest.TestCase):
+    """Test cases for the parallel image ingest pipeline"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        os.chdir(self.temp_dir)
+        self.db = Database('games.db')
+        self.db.initialize()
+        self.game = Game(self.db.add_game('Zoo', 'Easy'), 'Zoo', 'Easy')
+
+        os.makedirs('originals')
+        Image.new('RGB', (3000, 2000), 'red').save(os.path.join('originals', 'photo.jpg'))
+        Image.new('RGBA', (300, 300), (0, 0, 255, 128)).save(os.path.join('originals', 'photo.png'))
+        with open(os.path.join('originals', 'broken.png'), 'wb') as f:
+            f.write(b'not an image')
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        self.db.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_images_are_normalized_and_catalogued(self):
+        """Test downscaling, RGBA conversion, errors and progress"""
+        sources = [os.path.join('originals', name)
+                   for name in ('photo.jpg', 'photo.png', 'broken.png')]
+        progress = []
+        with patch('engine.db', self.db):
+            records, errors = ingest_images(self.game, sources, workers=2,
+                                            progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(progress[-1], (3, 3))
+        self.assertEqual([os.path.basename(path) for path, _ in errors], ['broken.png'])
+        self.assertEqual(len(records), 2)
+
+        by_name = {record['original_name']: record for record in records}
+        self.assertEqual((by_name['photo.jpg']['width'], by_name['photo.jpg']['height']), (1024, 683))
+        with Image.open(by_name['photo.jpg']['image_path']) as stored:
+            self.assertEqual(stored.mode, 'RGBA')
+            self.assertEqual(stored.size, (1024, 683))
+        self.assertEqual(len(self.db.list_images(self.game.id)), 2)
+
+    def test_games_share_blobs(self):
+        """Test that one image in two games is stored once and reference counted"""
+        other = Game(self.db.add_game('Farm', 'Hard'), 'Farm', 'Hard')
+        source = [os.path.join('originals', 'photo.png')]
+        with patch('engine.db', self.db):
+            (record,), _ = ingest_images(self.game, source)
+            ingest_images(other, source)
+            image_path = record['image_path']
+            self.assertEqual(self.db.list_images(other.id), [image_path])
+
+            self.assertFalse(remove_game_image(self.game, image_path))
+            self.assertTrue(os.path.exists(image_path))
+            self.assertTrue(remove_game_image(other, image_path))
+            self.assertFalse(os.path.exists(image_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
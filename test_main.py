@@ -2,6 +2,7 @@ import unittest
 import os
 import tempfile
 import shutil
+import threading
 from unittest.mock import patch, MagicMock
 from PIL import Image
 import sqlite3
@@ -9,6 +10,9 @@ import sqlite3
 # Import the functions we want to test
 # We'll need to refactor main.py to make it more testable
 from main import Game, resize_image, create_circular_mask
+from main import load_thumbnail_job, PdfJob, VirtualGallery, update_game_detail
+from main import remove_image_from_game
+from engine import ThumbnailCache, BuildCancelled
 
 
 class TestGame(unittest.TestCase):
@@ -97,6 +101,128 @@ class TestImageProcessing(unittest.TestCase):
         self.assertEqual(corner_pixel, 0)
 
 
+class TestGalleryThumbnails(unittest.TestCase):
+    """Test cases for the gallery's background thumbnail loading"""
+
+    def setUp(self):
+        """Set up test fixtures before each test method"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.image_path = os.path.join(self.temp_dir, 'photo.png')
+        Image.new('RGB', (400, 200), color='green').save(self.image_path)
+
+    def tearDown(self):
+        """Clean up after each test method"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_load_thumbnail_job(self):
+        """Test the background job used by the gallery"""
+        with patch('main.thumbnail_cache', ThumbnailCache(self.cache_dir)):
+            self.assertEqual(load_thumbnail_job(self.image_path).size, (100, 50))
+            with self.assertRaises(FileNotFoundError):
+                load_thumbnail_job(os.path.join(self.temp_dir, 'missing.png'))
+
+
+class TestGalleryUpdates(unittest.TestCase):
+    """Test cases for applying added and removed images to an open gallery"""
+
+    def setUp(self):
+        """Set up a gallery on a stand-in canvas, two rows of one tile are in view"""
+        patchers = [
+            patch('main.tk.Canvas'), patch('main.tk.Scrollbar'),
+            patch('main.GalleryTile', side_effect=lambda canvas: MagicMock()),
+            patch('main.thumbnail_executor'), patch('main.root', create=True),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.game = Game(1, 'Test', 'Easy')
+        images = [(f'img{i:02}.png', f'photo {i}') for i in range(10)]
+        self.gallery = VirtualGallery(MagicMock(), self.game, images)
+        self.gallery.canvas.canvasy.return_value = 0
+        self.gallery.canvas.winfo_height.return_value = 2 * VirtualGallery.TILE_HEIGHT
+        self.gallery.refresh()
+
+    def tiles(self):
+        return {index: tile.image for index, tile in self.gallery.visible.items()}
+
+    def test_remove_image(self):
+        """Test that only the removed tile and the ones after it change"""
+        first, third = self.gallery.visible[0], self.gallery.visible[2]
+        first.reset_mock()
+        self.gallery.remove_image('img01.png')
+        self.assertEqual(len(self.gallery.images), 9)
+        self.assertEqual(self.tiles(), {0: 'img00.png', 1: 'img02.png',
+                                        2: 'img03.png', 3: 'img04.png'})
+        self.assertIs(self.gallery.visible[0], first)
+        self.assertIs(self.gallery.visible[1], third)
+        first.show_placeholder.assert_not_called()
+        # Unknown images are ignored
+        self.gallery.remove_image('missing.png')
+        self.assertEqual(len(self.gallery.images), 9)
+
+    def test_insert_images(self):
+        """Test that added images take their catalog position"""
+        first = self.gallery.visible[0]
+        self.gallery.insert_images([('img005.png', 'new'), ('img03.png', 'renamed')])
+        self.assertEqual(len(self.gallery.images), 11)
+        self.assertEqual(self.tiles(), {0: 'img00.png', 1: 'img005.png',
+                                        2: 'img01.png', 3: 'img02.png'})
+        self.assertIs(self.gallery.visible[0], first)
+        self.assertEqual(self.gallery.names['img03.png'], 'renamed')
+
+    def test_update_game_detail(self):
+        """Test that the counts are updated in place and the view is kept"""
+        labels = MagicMock(), MagicMock()
+        with patch('main.current_gallery', self.gallery), patch('main.current_game_id', 1), \
+                patch('main.image_count_label', labels[0]), \
+                patch('main.gallery_title_label', labels[1]), \
+                patch('main.show_game_detail') as show_game_detail:
+            update_game_detail(self.game, added=[('img10.png', 'photo 10')],
+                               removed=['img00.png', 'img01.png'])
+            show_game_detail.assert_not_called()
+            # An order 2 deck takes 7 of the 9 images
+            labels[0].config.assert_called_with(text="Images: 9 (2 not used by the deck)")
+            labels[1].config.assert_called_with(text="🖼️ Image Gallery (9 images)")
+
+            # An emptied gallery is replaced by the "No Images Yet" view
+            update_game_detail(self.game, removed=list(self.gallery.images))
+            show_game_detail.assert_called_once_with(self.game)
+
+    def test_remove_missing_image(self):
+        """Test that an image whose file is already gone still leaves the gallery"""
+        with patch('main.remove_game_image') as remove_game_image, \
+                patch('main.update_game_detail') as update_game_detail, \
+                patch('main.messagebox') as messagebox:
+            remove_image_from_game(self.game, 'missing.png', 'photo')
+            remove_game_image.assert_called_once_with(self.game, 'missing.png')
+            update_game_detail.assert_called_once_with(self.game, removed=['missing.png'])
+            messagebox.showerror.assert_called_once()
+
+
+class TestPdfJob(unittest.TestCase):
+    """Test cases for PDF builds running behind the GUI"""
+
+    def fake_build(self, game, workers, progress, cancel):
+        """Stand-in for build_game_pdf that renders until it is cancelled"""
+        progress(12, 57, 1, 5)
+        self.started.set()
+        cancel.wait(5)
+        raise BuildCancelled("PDF build cancelled")
+
+    def test_progress_and_cancel(self):
+        """Test that the job reports progress and stops when cancelled"""
+        self.started = threading.Event()
+        with patch('main.build_game_pdf', self.fake_build):
+            job = PdfJob(Game(1, 'Test', 'Easy'))
+            self.assertTrue(self.started.wait(5))
+            self.assertEqual(job.status_text(), "Page 1/5, card 12/57")
+            job.cancel()
+            self.assertEqual(job.status_text(), "Cancelling...")
+            with self.assertRaises(BuildCancelled):
+                job.future.result(5)
+
+
 class TestDatabaseOperations(unittest.TestCase):
     """Test cases for database operations"""
     
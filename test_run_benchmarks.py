@@ -0,0 +1,82 @@
+import unittest
+import os
+import tempfile
+import shutil
+from PIL import Image
+
+import run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test cases for the benchmark corpora and baseline comparison"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_corpus_mixes_formats_and_is_reused(self):
+        """A corpus holds the requested number of mixed images and isn't regenerated"""
+        folder = run_benchmarks.generate_corpus(self.temp_dir, 12)
+        files = sorted(f for f in os.listdir(folder) if not f.startswith('.'))
+        self.assertEqual(len(files), 12)
+
+        formats = set()
+        sizes = set()
+        for f in files:
+            with Image.open(os.path.join(folder, f)) as image:
+                formats.add((image.format, image.mode))
+                sizes.add(image.size)
+        self.assertIn(('PNG', 'RGBA'), formats)
+        self.assertIn(('PNG', 'P'), formats)
+        self.assertIn(('JPEG', 'RGB'), formats)
+        self.assertEqual(len(sizes), len(run_benchmarks.IMAGE_VARIANTS))
+
+        mtime = os.path.getmtime(os.path.join(folder, files[0]))
+        run_benchmarks.generate_corpus(self.temp_dir, 12)
+        self.assertEqual(os.path.getmtime(os.path.join(folder, files[0])), mtime)
+
+    def test_run_benchmark(self):
+        """A benchmark reports its time, item count and peak memory"""
+        folder = run_benchmarks.generate_corpus(self.temp_dir, 7)
+        result = run_benchmarks.run_benchmark('create_circle_with_images', folder, 2)
+        self.assertEqual(result['count'], 7)
+        self.assertGreater(result['seconds'], 0)
+
+    def test_warm_gallery_reopens_the_cache(self):
+        """The warm gallery pass reads the thumbnails a previous run stored"""
+        folder = run_benchmarks.generate_corpus(self.temp_dir, 7)
+        cache_dir = os.path.join(self.temp_dir, 'thumbnails')
+        run_benchmarks.run_benchmark('gallery_thumbnails', folder, 2, cache_dir)
+        stored = sorted(os.listdir(cache_dir))
+        result = run_benchmarks.run_benchmark('gallery_thumbnails_warm', folder, 2, cache_dir)
+        self.assertEqual(result['count'], 7)
+        self.assertEqual(sorted(os.listdir(cache_dir)), stored)
+
+    def test_deck_benchmarks_skip_clamped_corpora(self):
+        """Corpora past the largest deck would repeat the same workload"""
+        self.assertEqual(run_benchmarks.deck_sizes([5, 10, 100, 1000, 10000], 11),
+                         [10, 100, 1000])
+        self.assertEqual(run_benchmarks.deck_sizes([10, 100, 1000], 2), [10])
+
+    def test_compare_flags_regressions_over_threshold(self):
+        """Only slowdowns or memory growth beyond the threshold are regressions"""
+        baseline = {
+            'create_pdf/100': {'seconds': 2.0, 'peak_rss_mb': 80.0},
+            'resize_image/100': {'seconds': 1.0, 'peak_rss_mb': 50.0},
+        }
+        results = {
+            'create_pdf/100': {'seconds': 2.3, 'peak_rss_mb': 120.0},
+            'resize_image/100': {'seconds': 1.5, 'peak_rss_mb': 50.0},
+            'resize_image/1000': {'seconds': 10.0, 'peak_rss_mb': 50.0},
+        }
+        regressions = run_benchmarks.compare(results, baseline, 0.2)
+        self.assertEqual(regressions, [
+            ('create_pdf/100', 'peak_rss_mb', 80.0, 120.0),
+            ('resize_image/100', 'seconds', 1.0, 1.5),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()